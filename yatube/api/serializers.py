@@ -0,0 +1,107 @@
+"""Сериализаторы API поверх строк values().
+
+Сериализатор читает из базы только колонки запрошенных полей (и ключ
+курсора), а авторов и группы подставляет пачкой: одним запросом
+к пользователям на страницу и из реестра групп.
+"""
+from django.core.exceptions import ValidationError
+from posts.groups import get_registry
+from posts.models import Post, User
+
+
+class Serializer:
+    fields = ()
+    columns = {}
+    required = ()
+
+    def __init__(self, fields=None):
+        self.fields = tuple(fields or self.fields)
+
+    @classmethod
+    def from_request(cls, request):
+        """Сериализатор полей из ?fields=a,b; без параметра — всех полей."""
+        raw = request.GET.get('fields', '')
+        fields = tuple(dict.fromkeys(
+            field.strip() for field in raw.split(',') if field.strip()
+        ))
+        unknown = set(fields) - set(cls.fields)
+        if unknown:
+            raise ValidationError(
+                'Неизвестные поля: ' + ', '.join(sorted(unknown)),
+                code='unknown_fields'
+            )
+        return cls(fields)
+
+    def values(self, queryset):
+        columns = [self.columns.get(field, field) for field in self.fields]
+        return queryset.values(*dict.fromkeys((*self.required, *columns)))
+
+    def prepare(self, rows):
+        """Пачкой загружает то, что нужно полям всех строк."""
+
+    def value(self, row, field):
+        return row[self.columns.get(field, field)]
+
+    def serialize(self, rows):
+        rows = list(rows)
+        self.prepare(rows)
+        return [
+            {field: self.value(row, field) for field in self.fields}
+            for row in rows
+        ]
+
+    def serialize_one(self, row):
+        return self.serialize([row])[0]
+
+
+class AuthorsMixin:
+    def prepare(self, rows):
+        super().prepare(rows)
+        self.usernames = {}
+        if 'author' in self.fields:
+            self.usernames = dict(
+                User.objects
+                .filter(id__in={row['author_id'] for row in rows})
+                .values_list('id', 'username')
+            )
+
+    def value(self, row, field):
+        if field == 'author':
+            return self.usernames.get(row['author_id'])
+        return super().value(row, field)
+
+
+class PostSerializer(AuthorsMixin, Serializer):
+    fields = (
+        'id', 'title', 'text', 'author', 'group', 'image', 'comment_count',
+        'created', 'updated',
+    )
+    columns = {'author': 'author_id', 'group': 'group_id'}
+    required = ('id', 'created')
+
+    def prepare(self, rows):
+        super().prepare(rows)
+        self.groups = get_registry().by_id if 'group' in self.fields else {}
+        self.storage = Post._meta.get_field('image').storage
+
+    def value(self, row, field):
+        if field == 'group':
+            group = self.groups.get(row['group_id'])
+            return group.slug if group else None
+        if field == 'image':
+            return self.storage.url(row['image']) if row['image'] else None
+        return super().value(row, field)
+
+
+class CommentSerializer(AuthorsMixin, Serializer):
+    fields = ('id', 'post', 'author', 'text', 'created', 'updated')
+    columns = {'post': 'post_id', 'author': 'author_id'}
+    required = ('id', 'created')
+
+
+class GroupSerializer(Serializer):
+    """Группы берутся из реестра, поэтому строки здесь — объекты Group."""
+    fields = ('id', 'slug', 'title', 'description')
+
+    def value(self, row, field):
+        return getattr(row, field)
@@ -0,0 +1,207 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import print_func_info
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ApiAuthor')
+        cls.reader = User.objects.create_user(username='ApiReader')
+        cls.group = Group.objects.create(
+            title='Группа API', slug='api-group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}',
+                group=self.group if number % 2 else None
+            )
+            for number in range(5)
+        ]
+        self.author_client = Client()
+        self.author_client.force_login(ApiTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTests.reader)
+
+    def send(self, client, method, url, data=None):
+        return getattr(client, method)(
+            url, json.dumps(data or {}), content_type='application/json'
+        )
+
+    def collect(self, url, params):
+        seen = []
+        while True:
+            payload = self.client.get(url, params).json()
+            seen += payload['results']
+            if not payload['next']:
+                return seen
+            params = {**params, 'cursor': payload['next']}
+
+    @print_func_info
+    def test_post_list_pages_by_cursor(self):
+        """Список постов листается курсором без повторов и пропусков."""
+        seen = self.collect(reverse('api:post_list'), {'limit': 2})
+        self.assertEqual(
+            [post['id'] for post in seen],
+            [post.id for post in reversed(self.posts)]
+        )
+        self.assertEqual(seen[0]['author'], self.author.username)
+        self.assertEqual(seen[-2]['group'], self.group.slug)
+
+    @print_func_info
+    def test_post_list_filters(self):
+        """Посты фильтруются по группе, автору и ленте подписок."""
+        url = reverse('api:post_list')
+        group_posts = self.client.get(url, {'group': self.group.slug}).json()
+        self.assertEqual(len(group_posts['results']), 2)
+        self.assertEqual(
+            self.client.get(url, {'author': self.reader.username})
+            .json()['results'],
+            []
+        )
+        self.assertEqual(
+            self.client.get(url, {'feed': 'follow'}).status_code, 401
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = self.reader_client.get(url, {'feed': 'follow'}).json()
+        self.assertEqual(len(follow['results']), 5)
+
+    @print_func_info
+    def test_follow_feed_filters(self):
+        """Фильтры ленты подписок не оставляют пустых страниц."""
+        url = reverse('api:post_list')
+        Follow.objects.create(user=self.reader, author=self.author)
+        params = {'feed': 'follow', 'group': self.group.slug, 'limit': 1}
+        seen = []
+        while True:
+            payload = self.reader_client.get(url, params).json()
+            seen += payload['results']
+            if not payload['next']:
+                break
+            params['cursor'] = payload['next']
+        self.assertEqual(
+            [post['id'] for post in seen],
+            [self.posts[3].id, self.posts[1].id]
+        )
+        payload = self.reader_client.get(url, {
+            'feed': 'follow', 'author': self.reader.username
+        }).json()
+        self.assertEqual(payload['results'], [])
+
+    @print_func_info
+    def test_fields_selection(self):
+        """?fields= оставляет только указанные поля."""
+        url = reverse('api:post_list')
+        payload = self.client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(set(payload['results'][0]), {'id', 'text'})
+        self.assertEqual(
+            self.client.get(url, {'fields': 'id,secret'}).status_code, 400
+        )
+
+    @print_func_info
+    def test_post_list_queries_do_not_grow_with_page(self):
+        """Авторы и группы подставляются пачкой, а не по запросу на пост."""
+        url = reverse('api:post_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, {'limit': 1})
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url, {'limit': 5})
+        self.assertEqual(len(few), len(many))
+
+    @print_func_info
+    def test_create_and_edit_post(self):
+        """Пост создает любой пользователь, а правит только автор."""
+        url = reverse('api:post_list')
+        self.assertEqual(
+            self.send(self.client, 'post', url, {'text': 'Гость'})
+            .status_code,
+            401
+        )
+        response = self.send(
+            self.author_client, 'post', url,
+            {'text': 'Новый', 'group': self.group.slug}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['group'], self.group.slug)
+        detail = reverse('api:post_detail', args=(response.json()['id'],))
+        self.assertEqual(
+            self.send(self.reader_client, 'patch', detail, {'text': 'Чужой'})
+            .status_code,
+            403
+        )
+        response = self.send(
+            self.author_client, 'patch', detail, {'text': 'Исправлен'}
+        )
+        self.assertEqual(response.json()['text'], 'Исправлен')
+        self.assertEqual(response.json()['group'], self.group.slug)
+
+    @print_func_info
+    def test_comments(self):
+        """Комментарии добавляются, листаются и удаляются только автором."""
+        post = self.posts[0]
+        url = reverse('api:comment_list', args=(post.id,))
+        for number in range(3):
+            response = self.send(
+                self.reader_client, 'post', url, {'text': f'К{number}'}
+            )
+            self.assertEqual(response.status_code, 201)
+        seen = self.collect(url, {'limit': 2, 'order': 'oldest'})
+        self.assertEqual(
+            [comment['text'] for comment in seen], ['К0', 'К1', 'К2']
+        )
+        comment_url = reverse('api:comment_detail', args=(seen[0]['id'],))
+        self.assertEqual(
+            self.author_client.delete(comment_url).status_code, 403
+        )
+        self.assertEqual(
+            self.reader_client.delete(comment_url).status_code, 204
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(Comment.objects.filter(post=post).count(), 2)
+
+    @print_func_info
+    def test_groups(self):
+        """Группы отдаются списком и по слагу."""
+        self.assertEqual(
+            self.client.get(reverse('api:group_list')).json()['results'],
+            [{
+                'id': self.group.id, 'slug': self.group.slug,
+                'title': self.group.title,
+                'description': self.group.description,
+            }]
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse('api:group_detail', args=('missing',))
+            ).status_code,
+            404
+        )
+
+    @print_func_info
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка через API."""
+        url = reverse('api:follow_detail', args=(self.author.username,))
+        self.assertEqual(self.reader_client.post(url).status_code, 201)
+        self.assertEqual(self.reader_client.post(url).status_code, 200)
+        self.assertEqual(
+            self.reader_client.get(reverse('api:follow_list')).json(),
+            {'results': [self.author.username], 'next': None}
+        )
+        self.assertEqual(self.author_client.post(url).status_code, 400)
+        self.assertEqual(self.reader_client.delete(url).status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
@@ -0,0 +1,248 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from posts.feeds import FollowFeedPaginator
+from posts.forms import CommentForm, PostForm
+from posts.groups import find_group, get_group_or_404, get_registry
+from posts.models import Comment, Follow, Post, User
+from posts.permissions import can_delete_comment, can_edit_post
+from posts.utils import (KeysetPaginator, delete_comment, follow_author,
+                         pack_cursor, save_comment, save_post, seek_page,
+                         unfollow_author, unpack_cursor)
+
+from .serializers import CommentSerializer, GroupSerializer, PostSerializer
+
+
+class NotAuthenticated(Exception):
+    pass
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_view(*methods):
+    """Разрешает методы methods и переводит ошибки в JSON-ответы."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error(405, 'Метод не разрешен')
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except NotAuthenticated:
+                return error(401, 'Нужна авторизация')
+            except PermissionDenied:
+                return error(403, 'Недостаточно прав')
+            except Http404:
+                return error(404, 'Не найдено')
+            except ValidationError as exc:
+                return error(400, exc.messages)
+        return wrapper
+    return decorator
+
+
+def require_user(request):
+    if not request.user.is_authenticated:
+        raise NotAuthenticated
+    return request.user
+
+
+def read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeError):
+        raise ValidationError('Тело запроса — не JSON')
+    if not isinstance(data, dict):
+        raise ValidationError('Ожидается JSON-объект')
+    return data
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError('limit должен быть числом')
+    return min(max(size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def page_response(serializer, rows, next_cursor):
+    return JsonResponse({
+        'results': serializer.serialize(rows),
+        'next': next_cursor or None,
+    })
+
+
+def form_errors(form):
+    return ValidationError([
+        f'{field}: {message}'
+        for field, messages in form.errors.items()
+        for message in messages
+    ])
+
+
+def post_form_data(data, post=None):
+    """Данные PostForm из JSON: группа приходит слагом."""
+    form_data = {}
+    if post is not None:
+        form_data = {
+            'title': post.title, 'text': post.text, 'group': post.group_id
+        }
+    form_data.update(
+        (field, data[field]) for field in ('title', 'text') if field in data
+    )
+    if data.get('group'):
+        group = find_group(data['group'])
+        if group is None:
+            raise ValidationError('group: сообщество не найдено')
+        form_data['group'] = group.id
+    elif 'group' in data:
+        form_data['group'] = None
+    return form_data
+
+
+@api_view('GET', 'POST')
+def post_list(request):
+    """Посты ленты: всех, ?feed=follow, ?group=слаг или ?author=имя."""
+    if request.method == 'POST':
+        user = require_user(request)
+        form = PostForm(post_form_data(read_json(request)))
+        if not form.is_valid():
+            raise form_errors(form)
+        post = form.save(commit=False)
+        post.author = user
+        save_post(post)
+        return post_response(post.id, PostSerializer(), status=201)
+    serializer = PostSerializer.from_request(request)
+    filters = {}
+    if request.GET.get('group'):
+        filters['group_id'] = get_group_or_404(request.GET['group']).id
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+        filters['author_id'] = author.id
+    queryset = serializer.values(Post.objects.filter(**filters))
+    paginator_class, options = KeysetPaginator, {}
+    if request.GET.get('feed') == 'follow':
+        paginator_class = FollowFeedPaginator
+        options = {'user': require_user(request), 'post_filters': filters}
+    paginator = paginator_class(queryset, page_size(request), **options)
+    rows, next_cursor = paginator.cursor_page(request.GET.get('cursor'))
+    return page_response(serializer, rows, next_cursor)
+
+
+def post_response(post_id, serializer, status=200):
+    row = serializer.values(Post.objects.filter(id=post_id)).first()
+    if row is None:
+        raise Http404
+    return JsonResponse(serializer.serialize_one(row), status=status)
+
+
+@api_view('GET', 'PATCH')
+def post_detail(request, post_id):
+    if request.method == 'PATCH':
+        require_user(request)
+        post = get_object_or_404(Post, id=post_id)
+        if not can_edit_post(request.user, post):
+            raise PermissionDenied
+        form = PostForm(
+            post_form_data(read_json(request), post), instance=post
+        )
+        if not form.is_valid():
+            raise form_errors(form)
+        save_post(form.save(commit=False))
+        return post_response(post.id, PostSerializer())
+    return post_response(post_id, PostSerializer.from_request(request))
+
+
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    """Комментарии поста: новые первыми или ?order=oldest."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    if request.method == 'POST':
+        user = require_user(request)
+        form = CommentForm(read_json(request))
+        if not form.is_valid():
+            raise form_errors(form)
+        comment = form.save(commit=False)
+        comment.author = user
+        comment.post = post
+        save_comment(comment)
+        serializer = CommentSerializer()
+        row = serializer.values(Comment.objects.filter(id=comment.id)).get()
+        return JsonResponse(serializer.serialize_one(row), status=201)
+    serializer = CommentSerializer.from_request(request)
+    rows, next_cursor = seek_page(
+        serializer.values(
+            Comment.objects
+            .filter(post_id=post.id)
+            .order_by('-created', '-id')
+        ),
+        page_size(request),
+        request.GET.get('cursor'),
+        reverse=request.GET.get('order') == 'oldest'
+    )
+    return page_response(serializer, rows, next_cursor)
+
+
+@api_view('DELETE')
+def comment_detail(request, comment_id):
+    require_user(request)
+    comment = get_object_or_404(Comment, id=comment_id)
+    if not can_delete_comment(request.user, comment):
+        raise PermissionDenied
+    delete_comment(comment)
+    return HttpResponse(status=204)
+
+
+@api_view('GET')
+def group_list(request):
+    serializer = GroupSerializer.from_request(request)
+    return JsonResponse({
+        'results': serializer.serialize(get_registry().groups)
+    })
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    serializer = GroupSerializer.from_request(request)
+    return JsonResponse(serializer.serialize_one(get_group_or_404(slug)))
+
+
+@api_view('GET')
+def follow_list(request):
+    """Авторы, на которых подписан пользователь, по порядку подписки."""
+    user = require_user(request)
+    follows = Follow.objects.filter(user=user).order_by('id')
+    cursor = unpack_cursor(request.GET.get('cursor'))
+    if cursor:
+        try:
+            follows = follows.filter(id__gt=int(cursor[0]))
+        except ValueError:
+            raise ValidationError('Неверный курсор')
+    size = page_size(request)
+    rows = list(follows.values_list('id', 'author__username')[:size + 1])
+    next_cursor = pack_cursor(rows[size - 1][0]) if len(rows) > size else None
+    return JsonResponse({
+        'results': [username for _, username in rows[:size]],
+        'next': next_cursor,
+    })
+
+
+@api_view('POST', 'DELETE')
+def follow_detail(request, username):
+    user = require_user(request)
+    author = get_object_or_404(User, username=username)
+    if request.method == 'DELETE':
+        unfollow_author(user, author)
+        return HttpResponse(status=204)
+    if author == user:
+        raise ValidationError('Нельзя подписаться на себя')
+    created = follow_author(user, author)
+    return JsonResponse({'author': author.username},
+                        status=201 if created else 200)
@@ -0,0 +1,127 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from .replicas import primary_reads
+
+
+def get_version(name):
+    """Текущая версия набора данных name.
+
+    Версия живет CACHE_VERSION_TIMEOUT секунд, а после этого
+    заменяется новой, как при bump_version().
+    """
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), settings.CACHE_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Сбрасывает все страницы, закешированные с версией name."""
+    key = f'version:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), settings.CACHE_VERSION_TIMEOUT)
+
+
+def bump_version_on_commit(name):
+    """Сбрасывает версию name после коммита текущей транзакции.
+
+    До коммита новые данные видны только пишущему соединению: страница,
+    пересобранная в это время, сохранилась бы под новой версией без них.
+    """
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def page_cache_key(request, key_prefix):
+    viewer = request.user.pk if request.user.is_authenticated else 0
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{key_prefix}:{viewer}:{path}'
+
+
+def _wait_for_entry(key, version):
+    deadline = time.monotonic() + settings.FEED_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry
+    return None
+
+
+def _cached_response(entry):
+    _, content, content_type = entry
+    return HttpResponse(content, content_type=content_type)
+
+
+def versioned_cache_page(timeout, key_prefix, version):
+    """Кеширует страницу до смены версии version.
+
+    Страница хранится отдельно для каждого пользователя и строки
+    запроса. Пересобирает страницу только один запрос: остальные в это
+    время получают прежнюю копию или ждут новую FEED_CACHE_WAIT секунд.
+    Пересборка читает с основной базы, а не с реплики.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = page_cache_key(request, key_prefix)
+            current = get_version(version)
+            entry = cache.get(key)
+            if entry is not None and entry[0] == current:
+                return _cached_response(entry)
+            lock = f'{key}:lock'
+            locked = cache.add(lock, 1, settings.FEED_CACHE_LOCK_TIMEOUT)
+            if not locked:
+                entry = entry or _wait_for_entry(key, current)
+                if entry is not None:
+                    return _cached_response(entry)
+            try:
+                # Копия живет до смены версии и не должна отставать.
+                with primary_reads():
+                    response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(
+                        key,
+                        (current, response.content, response['Content-Type']),
+                        timeout
+                    )
+            finally:
+                if locked:
+                    cache.delete(lock)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(stamp):
+    """Отвечает 304 Not Modified, пока не изменился stamp страницы.
+
+    stamp(request, *args, **kwargs) возвращает пару (etag, last_modified)
+    и вызывается один раз до view: шаблоны при 304 не рендерятся.
+    """
+    def stamp_once(request, *args, **kwargs):
+        if not hasattr(request, '_page_stamp'):
+            request._page_stamp = stamp(request, *args, **kwargs)
+        return request._page_stamp
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: (
+            stamp_once(request, *args, **kwargs)[0]
+        ),
+        last_modified_func=lambda request, *args, **kwargs: (
+            stamp_once(request, *args, **kwargs)[1]
+        ),
+    )
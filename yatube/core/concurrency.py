@@ -0,0 +1,79 @@
+"""Параллельный запуск независимых частей страницы.
+
+Django 2.2 не умеет ASGI и асинхронных view, поэтому страницы лент не
+могут ждать базу через await. gather() дает тот же выигрыш внутри
+синхронного view: независимые запросы страницы (строки, счетчик,
+статистика автора, подписка) идут одновременно в общем пуле потоков, и
+запрос ждет самый долгий из них, а не их сумму.
+
+У каждого потока пула свое соединение с базой. Задачи получают
+contextvars и execute_wrapper-ы вызывающего потока, поэтому метрики
+запроса учитывают и их SQL. Внутри транзакции, внутри задачи пула и
+при VIEW_QUERY_WORKERS = 0 функции выполняются по очереди: транзакция
+принадлежит одному соединению, а задача, ждущая пул, может его занять.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import ContextVar, copy_context
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+_in_worker = ContextVar('in_query_worker', default=False)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.VIEW_QUERY_WORKERS,
+                thread_name_prefix='queries'
+            )
+        return _executor
+
+
+def runs_inline():
+    return (
+        settings.VIEW_QUERY_WORKERS < 1
+        or _in_worker.get()
+        or any(connection.in_atomic_block for connection in connections.all())
+    )
+
+
+def _run(func, wrappers):
+    _in_worker.set(True)
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for alias, alias_wrappers in wrappers.items():
+                for wrapper in alias_wrappers:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(wrapper)
+                    )
+            return func()
+    finally:
+        close_old_connections()
+
+
+def gather(*funcs):
+    """Вызывает функции без аргументов, результаты — в том же порядке.
+
+    Первая функция выполняется в текущем потоке, остальные — в пуле.
+    """
+    if len(funcs) < 2 or runs_inline():
+        return [func() for func in funcs]
+    wrappers = {
+        connection.alias: list(connection.execute_wrappers)
+        for connection in connections.all()
+    }
+    executor = get_executor()
+    futures = [
+        executor.submit(copy_context().run, _run, func, wrappers)
+        for func in funcs[1:]
+    ]
+    first = funcs[0]()
+    return [first] + [future.result() for future in futures]
@@ -0,0 +1,36 @@
+import time
+
+from core.replicas import sync_replicas
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в реплики DATABASE_REPLICAS, '
+        'один раз или каждые --interval секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между синхронизациями; 0 — синхронизировать один раз.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены')
+        aliases = ['default', *settings.DATABASE_REPLICAS]
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError('Копировать можно только SQLite-базы')
+        while True:
+            started = time.monotonic()
+            sync_replicas()
+            self.stdout.write(
+                f'Реплики обновлены за '
+                f'{time.monotonic() - started:.2f} с'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,294 @@
+"""Метрики запросов: SQL, шаблоны, кеш, время и размер ответа.
+
+MetricsMiddleware собирает метрики каждого запроса в RequestMetrics,
+складывает их в гистограммы по имени view и с вероятностью
+METRICS_LOG_SAMPLE_RATE пишет JSON-строку в лог yatube.metrics.
+Гистограммы копятся в памяти процесса и отдаются view metrics в
+текстовом формате Prometheus.
+
+Шаблоны и кеш в Django не дают хуков для замеров, поэтому install()
+один раз оборачивает Template.render и get/get_many бэкендов кеша.
+Обертки только проверяют contextvar, если запрос не замеряется.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('yatube.metrics')
+
+_current = ContextVar('request_metrics', default=None)
+_missing = object()
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = tuple(2 ** power for power in range(8, 24, 2))
+
+
+class RequestMetrics:
+    __slots__ = (
+        'queries', 'db_time', 'template_time', 'template_depth',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: считает запросы и время в базе."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками: счетчики по верхним границам."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [
+                [0] * (len(self.buckets) + 1), 0.0
+            ]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, (counts, total) in sorted(self.series.items()):
+            label = format_labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} counter',
+        ]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(labels)}}} {value}')
+        return lines
+
+
+def format_labels(labels):
+    view, = labels
+    view = view.replace('\\', '\\\\').replace('"', '\\"')
+    return f'view="{view}"'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = Counter(
+            'yatube_requests_total', 'Количество запросов.'
+        )
+        self.cache_hits = Counter(
+            'yatube_cache_hits_total', 'Попадания в кеш.'
+        )
+        self.cache_misses = Counter(
+            'yatube_cache_misses_total', 'Промахи кеша.'
+        )
+        self.duration = Histogram(
+            'yatube_request_duration_seconds', 'Время ответа.',
+            DURATION_BUCKETS
+        )
+        self.db_queries = Histogram(
+            'yatube_db_queries', 'SQL-запросов на запрос.', COUNT_BUCKETS
+        )
+        self.db_duration = Histogram(
+            'yatube_db_duration_seconds', 'Время SQL-запросов.',
+            DURATION_BUCKETS
+        )
+        self.template_duration = Histogram(
+            'yatube_template_duration_seconds', 'Время рендеринга шаблонов.',
+            DURATION_BUCKETS
+        )
+        self.response_size = Histogram(
+            'yatube_response_size_bytes', 'Размер ответа.', SIZE_BUCKETS
+        )
+
+    def record(self, view, duration, metrics, size):
+        labels = (view,)
+        with self.lock:
+            self.requests.inc(labels)
+            self.cache_hits.inc(labels, metrics.cache_hits)
+            self.cache_misses.inc(labels, metrics.cache_misses)
+            self.duration.observe(labels, duration)
+            self.db_queries.observe(labels, metrics.queries)
+            self.db_duration.observe(labels, metrics.db_time)
+            self.template_duration.observe(labels, metrics.template_time)
+            if size is not None:
+                self.response_size.observe(labels, size)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in (
+                self.requests, self.duration, self.db_queries,
+                self.db_duration, self.template_duration,
+                self.response_size, self.cache_hits, self.cache_misses,
+            ):
+                lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def track_queries(wrapper):
+    """Подключает execute_wrapper ко всем соединениям с базой."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield wrapper
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        metrics = _current.get()
+        if metrics is None or metrics.template_depth:
+            return render(self, context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.template_depth -= 1
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _missing, version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _missing:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _missing else value
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+def _wrap(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, 'metrics_wrapped', False):
+        setattr(cls, name, decorator(method))
+
+
+def install():
+    """Оборачивает рендеринг шаблонов и чтение из кешей CACHES."""
+    _wrap(Template, 'render', _timed_render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        _wrap(backend, 'get', _counted_get)
+        # BaseCache.get_many читает через get и уже посчитан.
+        if backend.get_many is not BaseCache.get_many:
+            _wrap(backend, 'get_many', _counted_get_many)
+
+
+class MetricsMiddleware:
+    """Замеряет каждый запрос и копит метрики в registry."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_LOG_SAMPLE_RATE
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with track_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unresolved>'
+        size = None if response.streaming else len(response.content)
+        registry.record(view, duration, metrics, size)
+        if self.sample_rate and random.random() < self.sample_rate:
+            logger.info(json.dumps({
+                'view': view,
+                'method': request.method,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'queries': metrics.queries,
+                'db_ms': round(metrics.db_time * 1000, 3),
+                'template_ms': round(metrics.template_time * 1000, 3),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'size': size,
+            }))
+        return response
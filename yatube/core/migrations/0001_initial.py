@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaHeartbeat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('beat', models.DateTimeField(verbose_name='Синхронизация')),
+            ],
+            options={
+                'verbose_name': 'Синхронизация реплик',
+                'verbose_name_plural': 'Синхронизации реплик',
+            },
+        ),
+    ]
@@ -2,11 +2,24 @@ from django.db import models
 
 
 class CreatedModel(models.Model):
-    """Абстрактная модель. Добавляет дату создания."""
+    """Абстрактная модель. Добавляет даты создания и изменения."""
     created = models.DateTimeField(
         'Дата создания',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         abstract = True
+
+
+class ReplicaHeartbeat(models.Model):
+    """Время последней синхронизации реплик с основной базой."""
+    beat = models.DateTimeField('Синхронизация')
+
+    class Meta:
+        verbose_name = 'Синхронизация реплик'
+        verbose_name_plural = 'Синхронизации реплик'
@@ -0,0 +1,166 @@
+"""Чтение с реплик базы для безопасных запросов.
+
+ReplicaMiddleware выбирает на время GET- или HEAD-запроса одну здоровую
+реплику из DATABASE_REPLICAS, и ReplicaRouter отправляет на нее все
+чтения запроса. Запись, транзакции и остальные запросы идут в default.
+Если запрос что-то записал в базу, пусть даже это GET-ссылка подписки,
+пользователь получает cookie REPLICA_PIN_COOKIE и REPLICA_PIN_SECONDS
+секунд читает с default, чтобы видеть свои изменения.
+
+Реплика здорова, если sync_replicas копировал на нее базу не позднее
+REPLICA_MAX_LAG секунд назад. Проверка кешируется в процессе на
+REPLICA_CHECK_INTERVAL секунд; без здоровых реплик чтения идут в default.
+Поэтому реплика может отставать на сумму этих настроек, и закрепление
+REPLICA_PIN_SECONDS должно быть не короче.
+"""
+import logging
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .models import ReplicaHeartbeat
+
+logger = logging.getLogger('yatube.replicas')
+
+REPLICA_PIN_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('read_alias', default=DEFAULT_DB_ALIAS)
+# Модели, которые запрос записывал в базу; None вне запроса.
+_writes = ContextVar('writes', default=None)
+_health = {}
+
+
+@contextmanager
+def primary_reads():
+    """Читает с default, например, перед записью результата в кеш."""
+    token = _read_alias.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах или None, если она недоступна."""
+    try:
+        beat = (
+            ReplicaHeartbeat.objects.using(alias)
+            .values_list('beat', flat=True)
+            .first()
+        )
+    except DatabaseError:
+        return None
+    if beat is None:
+        return None
+    return (timezone.now() - beat).total_seconds()
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked is not None and now - checked[0] < (
+        settings.REPLICA_CHECK_INTERVAL
+    ):
+        return checked[1]
+    lag = replica_lag(alias)
+    healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG
+    if not healthy:
+        logger.warning('Реплика %s недоступна, отставание: %s', alias, lag)
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    """Случайная здоровая реплика или default, если таких нет."""
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)
+    ]
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.append(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтений запроса и закрепляет писавших на default."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        alias = DEFAULT_DB_ALIAS
+        # В транзакции роутер все равно читает с default.
+        if (
+            request.method in SAFE_METHODS
+            and REPLICA_PIN_COOKIE not in request.COOKIES
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            alias = choose_replica()
+        writes = []
+        token = _read_alias.set(alias)
+        writes_token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(writes_token)
+            _read_alias.reset(token)
+        if writes:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True
+            )
+        return response
+
+
+def copy_database(path):
+    """Копирует SQLite-базу default в файл path.
+
+    Копия пишется во временный файл и подменяет path целиком, поэтому
+    открытые соединения дочитывают прежнюю версию.
+    """
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    temporary = f'{path}.sync'
+    target = sqlite3.connect(temporary)
+    try:
+        source.connection.backup(target)
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    os.replace(temporary, path)
+
+
+def sync_replicas():
+    """Отмечает время синхронизации и копирует default во все реплики."""
+    ReplicaHeartbeat.objects.update_or_create(
+        id=1, defaults={'beat': timezone.now()}
+    )
+    for alias in settings.DATABASE_REPLICAS:
+        connections[alias].close()
+        copy_database(connections[alias].settings_dict['NAME'])
@@ -0,0 +1,87 @@
+"""Настройка SQLite для работы под нагрузкой.
+
+При каждом новом соединении выставляются SQLITE_PRAGMAS: WAL, чтобы
+чтения не ждали записи, synchronous=NORMAL, mmap и кеш страниц. Реплики
+получают те же настройки, но только для чтения и без смены журнала.
+
+SQLite пишет в один поток, поэтому write_transaction() выстраивает
+записи процесса в очередь на блокировке, а «database is locked» от
+других процессов повторяет с экспоненциальной паузой.
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import (DEFAULT_DB_ALIAS, OperationalError, connections,
+                       transaction)
+from django.db.backends.signals import connection_created
+from django.db.models import Model
+from django.dispatch import receiver
+
+_write_lock = threading.RLock()
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if connection.alias in settings.DATABASE_REPLICAS:
+        pragmas.pop('journal_mode', None)
+        pragmas['query_only'] = 'ON'
+    # Мимо execute_wrapper-ов: настройка не считается запросом страницы.
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_busy(exc):
+    return 'database is locked' in str(exc)
+
+
+def _snapshot(args):
+    """pk и признак новой записи моделей среди args для повтора."""
+    return [
+        (obj, obj.pk, obj._state.adding)
+        for obj in args if isinstance(obj, Model)
+    ]
+
+
+def write_transaction(func):
+    """Выполняет func в транзакции, по очереди с другими записями.
+
+    При «database is locked» транзакция повторяется до
+    SQLITE_BUSY_RETRIES раз; объекты моделей из аргументов перед
+    повтором снова становятся несохраненными. Внутри внешней транзакции
+    повторять нечего: ошибка пробрасывается сразу.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        connection = connections[DEFAULT_DB_ALIAS]
+        serialize = (
+            connection.vendor == 'sqlite' and settings.SQLITE_WRITE_QUEUE
+        )
+        retries = 0
+        if not connection.in_atomic_block:
+            retries = settings.SQLITE_BUSY_RETRIES
+        snapshot = _snapshot(args)
+        attempt = 0
+        while True:
+            try:
+                with ExitStack() as stack:
+                    if serialize:
+                        stack.enter_context(_write_lock)
+                    with transaction.atomic():
+                        return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt >= retries or not is_busy(exc):
+                    raise
+            for obj, pk, adding in snapshot:
+                obj.pk = pk
+                obj._state.adding = adding
+            delay = settings.SQLITE_BUSY_BACKOFF * 2 ** attempt
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            attempt += 1
+    return wrapper
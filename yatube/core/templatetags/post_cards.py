@@ -0,0 +1,172 @@
+import logging
+import threading
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.defaultfilters import linebreaksbr
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+from posts.thumbnails import THUMBNAIL_VARIANTS, track_pending
+from sorl.thumbnail import get_thumbnail
+
+register = template.Library()
+
+logger = logging.getLogger(__name__)
+
+CARD_TEMPLATE = 'includes/postcard.html'
+PEN_MARKER = mark_safe('<!--post-pen-->')
+EXCERPT_LENGTH = 295
+HEADING_LENGTH = 30
+
+# Варианты карточки: стиль блока, миниатюра, нужна ли высота картинки
+# и выводится ли текст целиком.
+CARD_LAYOUTS = {
+    'feed': {
+        'style': '', 'thumbnail': THUMBNAIL_VARIANTS[0],
+        'sized': True, 'full_text': False,
+    },
+    'profile': {
+        'style': 'width: 70%; margin-left: 30%;',
+        'thumbnail': THUMBNAIL_VARIANTS[0],
+        'sized': True, 'full_text': False,
+    },
+    'detail': {
+        'style': '', 'thumbnail': THUMBNAIL_VARIANTS[1],
+        'sized': False, 'full_text': True,
+    },
+}
+
+_fields = {}
+_fields_lock = threading.Lock()
+
+
+def card_cache_key(post, layout):
+    return f'postcard:{layout}:{post.id}:{post.card_version}'
+
+
+def card_thumbnail(post, layout):
+    """Адрес и размеры миниатюры вместо тега {% thumbnail %}."""
+    if not post.image:
+        return None
+    geometry_string, options = layout['thumbnail']
+    try:
+        image = get_thumbnail(post.image, geometry_string, **options)
+        return {
+            'url': image.url,
+            'width': image.width,
+            'height': image.height if layout['sized'] else None,
+        }
+    except Exception:
+        # Как и тег sorl-thumbnail: без картинки, но с карточкой.
+        logger.exception('Не удалось получить миниатюру %s', post.image)
+        return None
+
+
+def card_fields(post, layout):
+    """Заголовок, отрывок и адреса карточки без учета миниатюры."""
+    options = CARD_LAYOUTS[layout]
+    # Обрезка проходит строку посимвольно: хватает начала текста,
+    # каждый символ которого дает в HTML хотя бы один символ.
+    text = post.text
+    truncated = not options['full_text'] and len(text) >= EXCERPT_LENGTH
+    if truncated:
+        excerpt = mark_safe(Truncator(
+            linebreaksbr(text[:EXCERPT_LENGTH + 1])
+        ).chars(EXCERPT_LENGTH))
+    else:
+        excerpt = linebreaksbr(text)
+    return {
+        'style': options['style'],
+        'heading': (
+            post.title or Truncator(text[:HEADING_LENGTH + 1]).chars(
+                HEADING_LENGTH
+            )
+        ),
+        'excerpt': excerpt,
+        'truncated': truncated,
+        'detail_url': reverse('posts:post_detail', args=(post.id,)),
+        'profile_url': reverse('posts:profile', args=(post.author,)),
+        'group_url': (
+            reverse('posts:group_list', args=(post.group.slug,))
+            if post.group else None
+        ),
+        'comment_icon': static('img/png/comment.ico'),
+    }
+
+
+def memoized_fields(post, layout, key):
+    """card_fields(), запомненные в процессе по версии поста."""
+    with _fields_lock:
+        fields = _fields.get(key)
+    if fields is None:
+        fields = card_fields(post, layout)
+        with _fields_lock:
+            _fields[key] = fields
+            while len(_fields) > settings.POST_CARD_MEMO_SIZE:
+                _fields.pop(next(iter(_fields)))
+    return fields
+
+
+def card_context(post, layout='feed', pen='', key=None):
+    """Все, что выводит карточка, посчитанное один раз в Python."""
+    key = key or card_cache_key(post, layout)
+    return {
+        **memoized_fields(post, layout, key),
+        'post': post,
+        'thumbnail': card_thumbnail(post, CARD_LAYOUTS[layout]),
+        'card_pen': pen,
+    }
+
+
+def card_pen(request, post):
+    if post.author_id != request.user.pk:
+        return ''
+    return render_to_string('includes/postpen.html', {'post': post})
+
+
+@register.inclusion_tag(CARD_TEMPLATE, takes_context=True)
+def render_post_card(context, post, layout='feed'):
+    """Карточка поста без кеша фрагментов."""
+    return card_context(post, layout, card_pen(context['request'], post))
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, layout='feed'):
+    """Возвращает HTML карточек постов, собранный из кеша фрагментов.
+
+    Фрагмент кешируется по версии поста и не зависит от читателя:
+    карандаш редактирования подставляется после чтения из кеша только
+    в посты самого читателя. Карточки с еще не готовыми миниатюрами
+    не кешируются.
+    """
+    request = context['request']
+    posts = list(posts)
+    keys = [card_cache_key(post, layout) for post in posts]
+    fragments = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key in fragments:
+            continue
+        with track_pending() as pending:
+            fragments[key] = render_to_string(
+                CARD_TEMPLATE, card_context(post, layout, PEN_MARKER, key)
+            )
+        if not pending:
+            missing[key] = fragments[key]
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [
+        mark_safe(
+            fragments[key].replace(PEN_MARKER, card_pen(request, post))
+        )
+        for post, key in zip(posts, keys)
+    ]
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, layout='feed'):
+    return post_cards(context, [post], layout)[0]
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
+from .forms import PostAdminForm
 from .models import Comment, Group, Post
+from .search import filter_posts
 
 
 @admin.register(Group)
@@ -15,6 +17,7 @@ class GroupAdmin(admin.ModelAdmin):
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
+    form = PostAdminForm
     list_display = (
         'pk',
         'title',
@@ -28,6 +31,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
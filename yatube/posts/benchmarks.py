@@ -0,0 +1,305 @@
+"""Замеры запросов, времени и памяти страниц posts на больших объемах.
+
+seed() наполняет базу пользователями, постами, перекошенным графом
+подписок и длинными ветками комментариев. run_benchmarks() проходит
+по SCENARIOS и для каждого сценария замеряет количество SQL-запросов,
+медиану времени ответа и пиковую память Python. check_budgets()
+сравнивает результат с бюджетами из BUDGETS_PATH. db_latency добавляет
+задержку к каждому SQL-запросу, чтобы оценить страницы на медленной
+базе. run_write_benchmark() замеряет пропускную способность записи
+постов и комментариев из нескольких потоков. run_card_benchmark()
+сравнивает рендер страницы карточек тегом render_post_card и прежними
+шаблонами includes/postcard.html.
+"""
+import json
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from core.metrics import RequestMetrics, track_queries
+from core.templatetags.post_cards import CARD_TEMPLATE, card_context
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.db.models import Count
+from django.template.loader import get_template
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Comment, Group, Post, User
+from .seeding import Seeder
+from .utils import save_comment, save_post
+from .writebehind import enqueue_comment, flush_comments
+
+BUDGETS_PATH = os.path.join(
+    os.path.dirname(__file__), 'benchmark_budgets.json'
+)
+
+# Карточка до render_post_card: все вычисления в шаблоне.
+LEGACY_CARD_TEMPLATE = 'posts/benchmark_postcard.html'
+
+VOLUMES = {
+    'users': 10_000,
+    'groups': 50,
+    'posts': 100_000,
+    'comments': 200_000,
+    'follows': 100_000,
+}
+
+
+def seed(scale=1.0, random_seed=0, workers=None):
+    """Наполняет пустую базу данными для замеров через Seeder."""
+    Seeder(seed=random_seed, workers=workers).run(**{
+        name: max(1, int(value * scale)) for name, value in VOLUMES.items()
+    })
+
+
+def pick_fixtures():
+    """Объекты, на которых гоняются сценарии: самые тяжелые из данных."""
+    reader = (
+        User.objects.annotate(total=Count('follower'))
+        .order_by('-total', 'id').first()
+    )
+    author = (
+        User.objects.annotate(total=Count('posts'))
+        .order_by('-total', 'id').first()
+    )
+    return {
+        'reader': reader,
+        'author': author,
+        'target': User.objects.exclude(id__in=[reader.id, author.id])
+        .exclude(following__user=reader).order_by('id').first(),
+        'group': Group.objects.annotate(total=Count('posts'))
+        .order_by('-total', 'id').first(),
+        'thread': Post.objects.order_by('-comment_count', 'id').first(),
+    }
+
+
+def follow_roundtrip(client, fixtures):
+    target = fixtures['target'].username
+    response = client.get(reverse('posts:profile_follow', args=(target,)))
+    return response, lambda: client.get(
+        reverse('posts:profile_unfollow', args=(target,))
+    )
+
+
+SCENARIOS = {
+    'index': lambda client, fixtures: client.get(reverse('posts:index')),
+    'group_posts': lambda client, fixtures: client.get(
+        reverse('posts:group_list', args=(fixtures['group'].slug,))
+    ),
+    'profile': lambda client, fixtures: client.get(
+        reverse('posts:profile', args=(fixtures['author'].username,))
+    ),
+    'post_detail': lambda client, fixtures: client.get(
+        reverse('posts:post_detail', args=(fixtures['thread'].id,))
+    ),
+    'follow_index': lambda client, fixtures: client.get(
+        reverse('posts:follow_index')
+    ),
+    'post_create': lambda client, fixtures: client.post(
+        reverse('posts:post_create'), {'text': 'Пост из замеров'}
+    ),
+    'add_comment': lambda client, fixtures: client.post(
+        reverse('posts:add_comment', args=(fixtures['thread'].id,)),
+        {'text': 'Комментарий из замеров'}
+    ),
+    'profile_follow': follow_roundtrip,
+}
+
+
+def run_scenario(scenario, client, fixtures):
+    """Выполняет сценарий на холодном кеше; возвращает (ответ, откат)."""
+    cache.clear()
+    result = scenario(client, fixtures)
+    if isinstance(result, tuple):
+        return result
+    return result, None
+
+
+def simulated_latency(seconds):
+    """execute_wrapper, который задерживает каждый запрос на seconds."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def measure(scenario, client, fixtures, repeat):
+    # Счетчик в execute_wrapper видит и запросы из пула gather().
+    with track_queries(RequestMetrics()) as queries:
+        tracemalloc.start()
+        try:
+            response, undo = run_scenario(scenario, client, fixtures)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    query_count = queries.queries
+    if undo:
+        undo()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _, undo = run_scenario(scenario, client, fixtures)
+        timings.append((time.perf_counter() - started) * 1000)
+        if undo:
+            undo()
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'time_ms': round(statistics.median(timings), 2),
+        'max_time_ms': round(max(timings), 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(repeat=5, names=None, db_latency=0.0):
+    fixtures = pick_fixtures()
+    client = Client()
+    client.force_login(fixtures['reader'])
+    with ExitStack() as stack:
+        if db_latency:
+            stack.enter_context(
+                track_queries(simulated_latency(db_latency))
+            )
+        return {
+            name: measure(scenario, client, fixtures, repeat)
+            for name, scenario in SCENARIOS.items()
+            if names is None or name in names
+        }
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as budgets:
+        return json.load(budgets)
+
+
+def check_budgets(results, budgets):
+    """Список превышений бюджета в виде строк «сценарий: метрика»."""
+    problems = []
+    for name, result in results.items():
+        if result['status'] >= 400:
+            problems.append(f'{name}: ответ {result["status"]}')
+        for metric, limit in budgets.get(name, {}).items():
+            if result[metric] > limit:
+                problems.append(
+                    f'{name}: {metric} = {result[metric]} > {limit}'
+                )
+    return problems
+
+
+def write_posts(author, post, writes, errors):
+    """Каждая пятая запись — пост, остальные — комментарии к post."""
+    try:
+        for number in range(writes):
+            try:
+                if number % 5 == 0:
+                    save_post(Post(author=author, text=f'Пост {number}'))
+                else:
+                    comment = Comment(
+                        post=post, author=author, text=f'Ответ {number}'
+                    )
+                    if settings.COMMENT_WRITE_BEHIND:
+                        enqueue_comment(comment)
+                    else:
+                        save_comment(comment)
+            except OperationalError:
+                errors.append(number)
+    finally:
+        connections.close_all()
+
+
+def run_write_benchmark(threads=8, writes=100):
+    """Пишет writes записей из каждого из threads потоков одновременно.
+
+    При COMMENT_WRITE_BEHIND в замер входит перенос всего журнала.
+    """
+    authors = [
+        User.objects.create_user(username=f'writer{number}')
+        for number in range(threads)
+    ]
+    post = Post.objects.create(author=authors[0], text='Ветка')
+    errors = []
+    workers = [
+        threading.Thread(
+            target=write_posts, args=(author, post, writes, errors)
+        )
+        for author in authors
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if settings.COMMENT_WRITE_BEHIND:
+        flush_comments()
+    elapsed = time.perf_counter() - started
+    written = threads * writes - len(errors)
+    return {
+        'threads': threads,
+        'writes': threads * writes,
+        'errors': len(errors),
+        'time_s': round(elapsed, 2),
+        'writes_per_s': round(written / elapsed, 1),
+    }
+
+
+def card_posts(cards):
+    """Несохраненные посты с длинным текстом: база замеру не нужна."""
+    author = User(id=1, username='cards')
+    group = Group(id=1, title='Карточки', slug='cards')
+    return [
+        Post(
+            id=number + 1, author=author, group=group,
+            text='Строка длинного поста для карточки.\n' * 20,
+            created=timezone.now(), comment_count=number,
+        )
+        for number in range(cards)
+    ]
+
+
+def time_page(render, posts, repeat):
+    """Медиана времени рендера всех карточек страницы в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for post in posts:
+            render(post)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run_card_benchmark(cards=10, repeat=200):
+    """Рендер страницы из cards карточек без кеша фрагментов.
+
+    render_post_card замеряется дважды: на первом показе версии поста
+    и с полями, уже запомненными в процессе.
+    """
+    posts = card_posts(cards)
+    legacy = get_template(LEGACY_CARD_TEMPLATE)
+    card = get_template(CARD_TEMPLATE)
+    legacy_ms = time_page(
+        lambda post: legacy.render({
+            'post': post, 'detail': False, 'card_pen': ''
+        }),
+        posts, repeat
+    )
+
+    def render(post):
+        return card.render(card_context(post))
+
+    with override_settings(POST_CARD_MEMO_SIZE=0):
+        tag_ms = time_page(render, posts, repeat)
+    memoized_ms = time_page(render, posts, repeat)
+    return {
+        'cards': cards,
+        'includes_ms': round(legacy_ms, 3),
+        'render_post_card_ms': round(tag_ms, 3),
+        'memoized_ms': round(memoized_ms, 3),
+        'speedup': round(legacy_ms / tag_ms, 2),
+        'memoized_speedup': round(legacy_ms / memoized_ms, 2),
+    }
@@ -0,0 +1,54 @@
+"""Пересчет данных, которые поддерживают сигналы.
+
+bulk_create не отправляет сигналов, поэтому после массовой загрузки
+счетчики, ленты подписок, поисковый индекс и версии кеша
+пересчитываются здесь за один проход.
+"""
+from contextlib import contextmanager
+
+from core.cache import bump_version_on_commit
+from django.db import transaction
+
+from .feeds import rebuild_timelines
+from .models import Post
+from .search import rebuild_index
+from .stats import reconcile_profile_stats
+from .utils import actual_comment_count
+
+
+@contextmanager
+def explicit_created(*models):
+    """Дает bulk_create сохранить заданные created и updated.
+
+    Только для однопоточных команд загрузки (import_posts, seed):
+    флаги меняются у полей модели, общих для всего процесса, и
+    параллельный запрос сохранил бы запись без дат.
+    """
+    flags = (('created', 'auto_now_add'), ('updated', 'auto_now'))
+    fields = [
+        (model._meta.get_field(name), flag)
+        for model in models for name, flag in flags
+    ]
+    for field, flag in fields:
+        setattr(field, flag, False)
+    try:
+        yield
+    finally:
+        for field, flag in fields:
+            setattr(field, flag, True)
+
+
+def rebuild_derived(batch_size=1000, log=None):
+    """Пересчитывает все в одной транзакции: до коммита видны прежние."""
+    log = log or (lambda message: None)
+    with transaction.atomic():
+        Post.objects.update(comment_count=actual_comment_count())
+        log('Счетчики комментариев пересчитаны')
+        reconcile_profile_stats(batch_size)
+        log('Счетчики профилей пересчитаны')
+        rebuild_timelines()
+        log('Ленты подписок собраны')
+        rebuild_index(batch_size)
+        log('Поисковый индекс собран')
+        bump_version_on_commit('groups')
+        bump_version_on_commit('feed')
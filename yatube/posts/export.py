@@ -0,0 +1,121 @@
+"""Потоковая выгрузка постов и комментариев пользователя.
+
+Сначала идут посты автора, затем его комментарии, те и другие по
+возрастанию id. Строки читаются из базы через iterator() пачками по
+EXPORT_CHUNK_SIZE и сразу превращаются в текст, поэтому память не
+зависит от объема истории. У каждой записи есть курсор: выгрузку,
+прерванную после записи, можно продолжить с after=<курсор>.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .groups import get_registry
+from .models import Comment, Post
+from .utils import pack_cursor, unpack_cursor
+
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+CSV_COLUMNS = (
+    'type', 'id', 'post_id', 'group', 'title', 'text', 'created', 'updated',
+    'cursor',
+)
+
+KINDS = ('post', 'comment')
+
+
+def decode_export_cursor(cursor):
+    """Пара (тип записи, id) из курсора; None — выгрузка с начала."""
+    try:
+        kind, pk = unpack_cursor(cursor)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if kind not in KINDS:
+        return None
+    return kind, pk
+
+
+def export_records(author, after=None, chunk_size=None):
+    """Записи выгрузки автора после курсора after."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    position = decode_export_cursor(after) or ('post', 0)
+    start = KINDS.index(position[0])
+    groups = get_registry().by_id
+    if start == 0:
+        posts = (
+            Post.objects
+            .filter(author_id=author.id, id__gt=position[1])
+            .order_by('id')
+            .values('id', 'group_id', 'title', 'text', 'created', 'updated')
+        )
+        for row in posts.iterator(chunk_size=chunk_size):
+            group = groups.get(row.pop('group_id'))
+            yield {
+                'type': 'post',
+                **row,
+                'group': group.slug if group else None,
+                'cursor': pack_cursor('post', row['id']),
+            }
+    comments = (
+        Comment.objects
+        .filter(author_id=author.id)
+        .order_by('id')
+        .values('id', 'post_id', 'text', 'created', 'updated')
+    )
+    if start == 1:
+        comments = comments.filter(id__gt=position[1])
+    for row in comments.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'comment',
+            **row,
+            'cursor': pack_cursor('comment', row['id']),
+        }
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку обратно."""
+
+    def write(self, value):
+        return value
+
+
+def render_jsonl(records, header=True):
+    for record in records:
+        yield json.dumps(
+            record, cls=DjangoJSONEncoder, ensure_ascii=False
+        ) + '\n'
+
+
+def render_csv(records, header=True):
+    writer = csv.DictWriter(Echo(), CSV_COLUMNS, extrasaction='ignore')
+    if header:
+        yield writer.writeheader()
+    for record in records:
+        yield writer.writerow({
+            **record,
+            'created': record['created'].isoformat(),
+            'updated': record['updated'].isoformat(),
+        })
+
+
+RENDERERS = {
+    'jsonl': render_jsonl,
+    'csv': render_csv,
+}
+
+
+def export_lines(author, export_format='jsonl', after=None, chunk_size=None):
+    """Строки выгрузки автора в формате export_format.
+
+    Продолжение выгрузки идет без заголовка CSV: его уже получили.
+    """
+    return RENDERERS[export_format](
+        export_records(author, after, chunk_size),
+        header=decode_export_cursor(after) is None
+    )
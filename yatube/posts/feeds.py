@@ -0,0 +1,179 @@
+"""Лента подписок, разложенная по пользователям при записи поста.
+
+У каждого пользователя есть свой список TimelineEntry. Новый пост
+копируется в списки всех подписчиков автора. Исключение — авторы
+HeavyAuthor с числом подписчиков от FEED_FANOUT_LIMIT: их посты
+подмешиваются в ленту при чтении.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Follow, HeavyAuthor, Post, TimelineEntry
+from .utils import KeysetPaginator, row_key, seek
+
+TIMELINE_KEYS = ('created', 'post_id')
+
+# Последние FEED_BACKFILL_LIMIT постов каждого обычного автора в ленты
+# всех его подписчиков, как при backfill_timeline().
+TIMELINE_FILL_SQL = (
+    'INSERT INTO {timeline} (user_id, post_id, created) '
+    'SELECT f.user_id, p.id, p.created FROM {follow} f '
+    'JOIN (SELECT id, author_id, created, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY created DESC, id DESC) AS position '
+    'FROM {post}) p ON p.author_id = f.author_id '
+    'WHERE p.position <= %s '
+    'AND f.author_id NOT IN (SELECT author_id FROM {heavy})'
+)
+
+
+def is_heavy_author(author_id):
+    """Проверяет, пора ли перестать раскладывать посты автора по лентам."""
+    if HeavyAuthor.objects.filter(author_id=author_id).exists():
+        return True
+    limit = settings.FEED_FANOUT_LIMIT
+    if Follow.objects.filter(author_id=author_id)[:limit].count() < limit:
+        return False
+    HeavyAuthor.objects.get_or_create(author_id=author_id)
+    return True
+
+
+def fan_out_post(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    if is_heavy_author(post.author_id):
+        return
+    followers = (
+        Follow.objects
+        .filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=settings.FEED_BATCH_SIZE)
+    )
+    batch = []
+    for user_id in followers:
+        batch.append(
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+        )
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_timeline(user_id, author_id):
+    """Копирует последние посты автора в ленту нового подписчика."""
+    if is_heavy_author(author_id):
+        return
+    posts = (
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-created')
+        .values_list('id', 'created')[:settings.FEED_BACKFILL_LIMIT]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts
+        ),
+        ignore_conflicts=True
+    )
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+class FollowFeedPaginator(KeysetPaginator):
+    """Пагинатор ленты подписок.
+
+    Сливает по ключу (created, id) личный список TimelineEntry и посты
+    тяжелых авторов, на которых подписан пользователь. Фильтры постов
+    post_filters применяются к ленте в том же запросе, что и выборка
+    страницы, а не к уже выбранной странице.
+    """
+
+    def __init__(self, object_list, per_page, user=None, post_filters=None,
+                 **kwargs):
+        self.user = user
+        self.post_filters = post_filters or {}
+        self.heavy_authors = list(
+            Follow.objects
+            .filter(user=user, author__heavy__isnull=False)
+            .values_list('author_id', flat=True)
+        )
+        super().__init__(object_list, per_page, **kwargs)
+
+    @property
+    def entries(self):
+        return (
+            TimelineEntry.objects
+            .filter(user=self.user)
+            .filter(**{
+                f'post__{field}': value
+                for field, value in self.post_filters.items()
+            })
+            .order_by('-created', '-post_id')
+        )
+
+    @property
+    def heavy_posts(self):
+        return self.object_list.filter(
+            author_id__in=self.heavy_authors, **self.post_filters
+        )
+
+    def _fetch(self, limit, position=None, reverse=False, offset=0):
+        ids = seek(
+            self.entries.values_list('post_id', flat=True),
+            offset + limit, position, reverse, keys=TIMELINE_KEYS
+        )
+        rows = list(self.object_list.filter(id__in=ids).order_by())
+        if self.heavy_authors:
+            rows += seek(self.heavy_posts, offset + limit, position, reverse)
+        posts = {row_key(row)[1]: row for row in rows}
+        rows = sorted(posts.values(), key=row_key, reverse=not reverse)
+        return rows[offset:offset + limit]
+
+    def _count(self, limit=None):
+        entries = self.entries
+        heavy_posts = self.heavy_posts.exclude(
+            timeline_entries__user=self.user
+        )
+        if limit is not None:
+            entries, heavy_posts = entries[:limit], heavy_posts[:limit]
+        count = entries.count()
+        if self.heavy_authors:
+            count += heavy_posts.count()
+        return count if limit is None else min(count, limit)
+
+
+def rebuild_timelines():
+    """Заново собирает ленты всех пользователей по таблице Follow.
+
+    Ленты собираются одним INSERT ... SELECT в транзакции: до коммита
+    читатели видят прежние ленты, а не пустые.
+    """
+    heavy_authors = (
+        Follow.objects
+        .order_by()
+        .values('author')
+        .annotate(followers=Count('id'))
+        .filter(followers__gte=settings.FEED_FANOUT_LIMIT)
+        .values_list('author', flat=True)
+    )
+    sql = TIMELINE_FILL_SQL.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+        heavy=HeavyAuthor._meta.db_table,
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        HeavyAuthor.objects.all().delete()
+        HeavyAuthor.objects.bulk_create(
+            HeavyAuthor(author_id=author_id) for author_id in heavy_authors
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [settings.FEED_BACKFILL_LIMIT])
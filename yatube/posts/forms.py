@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize_image
 from .models import Comment, Post
 
 
@@ -8,6 +10,18 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('title', 'text', 'group', 'image',)
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
+
+class PostAdminForm(PostForm):
+    """Форма админки: все поля поста, включая автора."""
+    class Meta(PostForm.Meta):
+        fields = '__all__'
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
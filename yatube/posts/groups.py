@@ -0,0 +1,117 @@
+"""Реестр сообществ в памяти процесса и в общем кеше.
+
+Групп мало, и меняются они редко, поэтому весь список хранится в
+кеше под версией «groups» и копируется в память процесса. Сохранение
+или удаление группы меняет версию, и каждый процесс перечитывает
+список при следующем обращении. В локальном кеше версия видна только
+своему процессу, но живет CACHE_VERSION_TIMEOUT секунд, а слаг, которого
+нет в реестре, проверяется по базе. Ленты не джойнят группы, а берут
+их из реестра через attach_groups().
+"""
+from core.cache import bump_version, get_version
+from core.replicas import primary_reads
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.http import Http404
+
+from .models import Group, Post
+
+_registry = None
+
+
+class GroupRegistry:
+    def __init__(self, version, groups):
+        self.version = version
+        self.groups = groups
+        self.by_id = {group.id: group for group in groups}
+        self.by_slug = {group.slug: group for group in groups}
+
+
+def get_registry():
+    """Реестр текущей версии: из памяти, из кеша или из базы."""
+    global _registry
+    version = get_version('groups')
+    if _registry is not None and _registry.version == version:
+        return _registry
+    key = f'groups:{version}'
+    groups = cache.get(key)
+    if groups is None:
+        with primary_reads():
+            groups = list(Group.objects.order_by('title', 'id'))
+        cache.set(key, groups, settings.GROUP_CACHE_TIMEOUT)
+    _registry = GroupRegistry(version, groups)
+    return _registry
+
+
+def find_group(slug):
+    """Группа по слагу или None."""
+    group = get_registry().by_slug.get(slug)
+    if group is not None:
+        return group
+    with primary_reads():
+        exists = Group.objects.filter(slug=slug).exists()
+    if not exists:
+        return None
+    # Группу сохранил другой процесс, а версия здесь еще прежняя.
+    bump_version('groups')
+    return get_registry().by_slug.get(slug)
+
+
+def get_group_or_404(slug):
+    group = find_group(slug)
+    if group is None:
+        raise Http404('Сообщество не найдено')
+    return group
+
+
+def attach_groups(posts):
+    """Подставляет постам группы из реестра вместо JOIN с group."""
+    by_id = get_registry().by_id
+    for post in posts:
+        group = by_id.get(post.group_id)
+        if group is not None:
+            post.group = group
+    return posts
+
+
+def group_directory():
+    """Группы с количеством постов и последним постом каждой.
+
+    Счетчики и последние посты кешируются до смены версии «feed»,
+    поэтому читаются с основной базы.
+    """
+    key = f'group_directory:{get_version("feed")}'
+    summary = cache.get(key)
+    if summary is None:
+        with primary_reads():
+            summary = directory_summary()
+        cache.set(key, summary, settings.FEED_CACHE_TIMEOUT)
+    return [
+        (group, *summary.get(group.id, (0, None)))
+        for group in get_registry().groups
+    ]
+
+
+def directory_summary():
+    """Количество постов и последний пост каждой группы по ее id."""
+    latest = (
+        Post.objects
+        .filter(group=OuterRef('pk'))
+        .order_by('-created', '-id')
+        .values('id')[:1]
+    )
+    rows = (
+        Group.objects
+        .annotate(total=Count('posts'), latest_id=Subquery(latest))
+        .values_list('id', 'total', 'latest_id')
+    )
+    summary = {group_id: (total, latest_id)
+               for group_id, total, latest_id in rows}
+    posts = Post.objects.select_related('author').in_bulk(
+        [latest_id for _, latest_id in summary.values() if latest_id]
+    )
+    return {
+        group_id: (total, posts.get(latest_id))
+        for group_id, (total, latest_id) in summary.items()
+    }
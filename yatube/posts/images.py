@@ -0,0 +1,98 @@
+import os
+import warnings
+from io import BytesIO
+
+from core.sqlite import write_transaction
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+from sorl import thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize_image(upload):
+    """Приводит загруженную картинку к формату хранения.
+
+    Уменьшает до IMAGE_MAX_SIDE по большей стороне, поворачивает по
+    EXIF и сохраняет без метаданных: прогрессивный JPEG или WebP
+    (для картинок с прозрачностью). Слишком большие файлы и картинки
+    больше IMAGE_MAX_PIXELS отклоняются до декодирования.
+    """
+    if upload.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_BYTES // 2 ** 20},
+            code='file_too_large'
+        )
+    max_side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(upload)
+            width, height = image.size
+            if width * height > settings.IMAGE_MAX_PIXELS:
+                raise ValidationError(
+                    'Слишком большое разрешение картинки.',
+                    code='too_many_pixels'
+                )
+            image.draft('RGB', (max_side, max_side))
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError(
+            'Слишком большое разрешение картинки.', code='too_many_pixels'
+        )
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image'
+        )
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    options = {'quality': settings.IMAGE_QUALITY}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if has_alpha(image) or settings.IMAGE_UPLOAD_FORMAT == 'WEBP':
+        image_format = 'WEBP'
+        image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+    else:
+        image_format = 'JPEG'
+        image = image.convert('RGB')
+        options.update(progressive=True, optimize=True)
+    output = BytesIO()
+    image.save(output, image_format, **options)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        f'{stem}.{EXTENSIONS[image_format]}',
+        output.getvalue(),
+        content_type=f'image/{image_format.lower()}'
+    )
+
+
+@write_transaction
+def release_image(name):
+    """Удаляет картинку и ее миниатюры, если на нее не ссылается ни один пост.
+
+    Одинаковые картинки хранятся одним файлом, поэтому файл удаляется
+    только вместе с последним постом, который на него ссылается.
+    Проверка и удаление идут в очереди записей: save_post, который
+    переиспользует тот же файл, держит очередь до коммита поста, так что
+    либо пост уже виден проверке, либо файл будет записан заново.
+    """
+    if not name or Post.objects.filter(image=name).exists():
+        return
+    storage = Post._meta.get_field('image').storage
+    try:
+        thumbnail.delete(ImageFile(name, storage))
+    except SuspiciousFileOperation:
+        pass
@@ -0,0 +1,239 @@
+"""Массовый импорт постов, комментариев, групп и подписок из JSON Lines.
+
+Каждая строка файла — объект с полем type:
+
+    {"type": "group", "slug": "...", "title": "...", "description": "..."}
+    {"type": "post", "id": 1, "author": "имя", "group": "слаг",
+     "title": "...", "text": "...", "created": "2020-01-01T00:00:00Z"}
+    {"type": "comment", "id": 7, "post": 1, "author": "имя",
+     "text": "...", "created": "..."}
+    {"type": "follow", "user": "имя", "author": "имя"}
+
+id постов и комментариев необязательны; если они есть, записи
+сохраняются с ними, и комментарии ссылаются на посты по этим id.
+Пользователи и группы ищутся через словари в памяти, недостающие
+пользователи создаются без пароля.
+
+Строки сохраняются пачками через bulk_create, каждая пачка — в своей
+транзакции вместе с ImportCheckpoint. bulk_create не отправляет
+сигналов, поэтому счетчики, ленты, поисковый индекс и версии кеша
+пересчитываются один раз в конце через rebuild_derived().
+"""
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .derived import explicit_created, rebuild_derived
+from .models import Comment, Follow, Group, ImportCheckpoint, Post, User
+
+REQUIRED = {
+    'group': ('slug',),
+    'post': ('author',),
+    'comment': ('post', 'author'),
+    'follow': ('user', 'author'),
+}
+KINDS = tuple(REQUIRED)
+TITLE_LENGTH = Post._meta.get_field('title').max_length
+
+
+def parse_created(value, line):
+    if not value:
+        return timezone.now()
+    created = parse_datetime(value)
+    if created is None:
+        raise ValidationError(f'Строка {line}: неверная дата {value!r}')
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created, timezone.utc)
+    return created
+
+
+class Importer:
+    """Читает файл JSON Lines и сохраняет его пачками с чекпоинтами."""
+
+    def __init__(self, path, batch_size=5000, log=None):
+        self.path = path
+        self.source = os.path.abspath(path)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.users = {}
+        self.groups = {}
+        self.stats = dict.fromkeys(KINDS, 0)
+        self.stats['skipped'] = 0
+
+    def checkpoint(self):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=self.source
+        )
+        return checkpoint
+
+    def lines(self, offset):
+        """Строки файла после offset вместе со смещением их конца."""
+        with open(self.path, 'rb') as source:
+            source.seek(offset)
+            for raw in source:
+                offset += len(raw)
+                yield raw, offset
+
+    def batches(self, checkpoint):
+        batch = []
+        number = checkpoint.lines
+        for raw, offset in self.lines(checkpoint.offset):
+            number += 1
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                raise ValidationError(f'Строка {number}: неверный JSON')
+            if not isinstance(record, dict) or record.get('type') not in KINDS:
+                raise ValidationError(f'Строка {number}: неизвестная запись')
+            missing = [
+                field for field in REQUIRED[record['type']]
+                if not record.get(field)
+            ]
+            if missing:
+                raise ValidationError(
+                    f'Строка {number}: нет полей ' + ', '.join(missing)
+                )
+            record['line'] = number
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch, offset, number
+                batch = []
+        if batch:
+            yield batch, offset, number
+
+    def run(self, derived=True):
+        """Импортирует файл с места последнего чекпоинта."""
+        checkpoint = self.checkpoint()
+        if checkpoint.lines:
+            self.log(f'Продолжаю со строки {checkpoint.lines + 1}')
+        for batch, offset, number in self.batches(checkpoint):
+            with transaction.atomic():
+                self.save(batch)
+                checkpoint.offset = offset
+                checkpoint.lines = number
+                checkpoint.save()
+            self.log(f'Строк: {number}')
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Post, Comment]
+            ):
+                cursor.execute(sql)
+        if derived:
+            rebuild_derived(self.batch_size, self.log)
+        return self.stats
+
+    def save(self, batch):
+        records = {kind: [] for kind in KINDS}
+        for record in batch:
+            records[record['type']].append(record)
+        self.resolve_users(batch)
+        self.save_groups(records['group'])
+        with explicit_created(Post, Comment):
+            self.save_posts(records['post'])
+            self.save_comments(records['comment'])
+        self.save_follows(records['follow'])
+
+    def resolve_users(self, batch):
+        """Дополняет словарь users и создает недостающих пользователей."""
+        names = {
+            record[field] for record in batch
+            for field in ('author', 'user') if record.get(field)
+        } - set(self.users)
+        if not names:
+            return
+        self.users.update(
+            User.objects.filter(username__in=names)
+            .values_list('username', 'id')
+        )
+        missing = names - set(self.users)
+        User.objects.bulk_create(
+            User(username=name, password=make_password(None))
+            for name in sorted(missing)
+        )
+        self.users.update(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'id')
+        )
+
+    def resolve_groups(self, slugs):
+        slugs = set(slugs) - set(self.groups)
+        if slugs:
+            self.groups.update(
+                Group.objects.filter(slug__in=slugs).values_list('slug', 'id')
+            )
+
+    def save_groups(self, records):
+        self.resolve_groups(record['slug'] for record in records)
+        new = {
+            record['slug']: Group(
+                slug=record['slug'],
+                title=record.get('title') or record['slug'],
+                description=record.get('description', ''),
+            )
+            for record in records if record['slug'] not in self.groups
+        }
+        Group.objects.bulk_create(new.values())
+        self.resolve_groups(new)
+        self.stats['group'] += len(new)
+
+    def save_posts(self, records):
+        self.resolve_groups(
+            record['group'] for record in records if record.get('group')
+        )
+        posts = []
+        for record in records:
+            created = parse_created(record.get('created'), record['line'])
+            posts.append(Post(
+                id=record.get('id'),
+                author_id=self.users[record['author']],
+                group_id=self.groups.get(record.get('group')),
+                title=(record.get('title') or '')[:TITLE_LENGTH] or None,
+                text=record.get('text', ''),
+                created=created,
+                updated=created,
+            ))
+        Post.objects.bulk_create(posts)
+        self.stats['post'] += len(posts)
+
+    def save_comments(self, records):
+        existing = set(
+            Post.objects
+            .filter(id__in={record['post'] for record in records})
+            .values_list('id', flat=True)
+        )
+        comments = []
+        for record in records:
+            if record['post'] not in existing:
+                self.stats['skipped'] += 1
+                continue
+            created = parse_created(record.get('created'), record['line'])
+            comments.append(Comment(
+                id=record.get('id'),
+                post_id=record['post'],
+                author_id=self.users[record['author']],
+                text=record.get('text', ''),
+                created=created,
+                updated=created,
+            ))
+        Comment.objects.bulk_create(comments)
+        self.stats['comment'] += len(comments)
+
+    def save_follows(self, records):
+        follows = []
+        for record in records:
+            user_id = self.users[record['user']]
+            author_id = self.users[record['author']]
+            if user_id == author_id:
+                self.stats['skipped'] += 1
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.stats['follow'] += len(follows)
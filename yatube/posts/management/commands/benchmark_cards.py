@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+from posts.benchmarks import run_card_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендер страницы карточек постов тегом '
+        'render_post_card и прежними шаблонами, без кеша фрагментов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cards', type=int, default=10,
+            help='Сколько карточек на странице.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз рендерить страницу.'
+        )
+        parser.add_argument(
+            '--output', default='benchmark_cards.json',
+            help='Куда записать результаты в JSON.'
+        )
+
+    def handle(self, *args, **options):
+        result = run_card_benchmark(options['cards'], options['repeat'])
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+        self.stdout.write(
+            f'{result["cards"]} карточек: шаблоны '
+            f'{result["includes_ms"]} мс, render_post_card '
+            f'{result["render_post_card_ms"]} мс '
+            f'(в {result["speedup"]} раза быстрее), с запомненными '
+            f'полями {result["memoized_ms"]} мс '
+            f'(в {result["memoized_speedup"]} раза быстрее)'
+        )
@@ -0,0 +1,92 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from posts.benchmarks import (BUDGETS_PATH, SCENARIOS, check_budgets,
+                              load_budgets, run_benchmarks, seed)
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет запросы, время и память страниц posts на тестовой '
+        'базе с большим объемом данных и сверяет их с бюджетами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Доля от полного объема данных (100 тысяч постов).'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз замерять время каждого сценария.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS),
+            help='Замерить только этот сценарий (можно несколько раз).'
+        )
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Куда записать результаты в JSON.'
+        )
+        parser.add_argument(
+            '--budgets', default=BUDGETS_PATH,
+            help='JSON с бюджетами; пустая строка — без проверки.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Количество процессов для генерации данных.'
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=0.0,
+            help='Задержка каждого SQL-запроса в миллисекундах.'
+        )
+        parser.add_argument(
+            '--sequential', action='store_true',
+            help='Выполнять запросы страницы по очереди, без пула потоков.'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу и не наполнять ее повторно.'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            if not Post.objects.exists():
+                self.stdout.write('Наполняю базу...')
+                seed(options['scale'], workers=options['workers'])
+            overrides = {}
+            if options['sequential']:
+                overrides['VIEW_QUERY_WORKERS'] = 0
+            with override_settings(**overrides):
+                results = run_benchmarks(
+                    options['repeat'], options['scenario'],
+                    db_latency=options['db_latency'] / 1000
+                )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["queries"]} запросов, '
+                f'{result["time_ms"]} мс, {result["peak_kb"]} КБ'
+            )
+        if options['budgets']:
+            problems = check_budgets(results, load_budgets(options['budgets']))
+            if problems:
+                raise CommandError(
+                    'Превышены бюджеты:\n' + '\n'.join(problems)
+                )
+        self.stdout.write('Бюджеты соблюдены')
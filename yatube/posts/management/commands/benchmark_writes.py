@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from posts.benchmarks import run_write_benchmark
+
+# Настройки Django по умолчанию: без прагм, очереди и повторов.
+BASELINE = {
+    'SQLITE_PRAGMAS': {},
+    'SQLITE_WRITE_QUEUE': False,
+    'SQLITE_BUSY_RETRIES': 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет одновременную запись постов и комментариев из '
+        'нескольких потоков во временную SQLite-базу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Количество пишущих потоков.'
+        )
+        parser.add_argument(
+            '--writes', type=int, default=100,
+            help='Сколько записей делает каждый поток.'
+        )
+        parser.add_argument(
+            '--baseline', action='store_true',
+            help='Без прагм, очереди записи и повторов, с timeout 5 с.'
+        )
+        parser.add_argument(
+            '--write-behind', action='store_true',
+            help='Комментарии через журнал отложенной записи.'
+        )
+        parser.add_argument(
+            '--output', default='benchmark_writes.json',
+            help='Куда записать результаты в JSON.'
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.TemporaryDirectory()
+        settings_dict = connection.settings_dict
+        old_name = settings_dict['NAME']
+        old_test_name = settings_dict['TEST']['NAME']
+        old_options = settings_dict['OPTIONS']
+        settings_dict['TEST']['NAME'] = os.path.join(
+            directory.name, 'writes.sqlite3'
+        )
+        if options['baseline']:
+            settings_dict['OPTIONS'] = {}
+        overrides = dict(BASELINE) if options['baseline'] else {}
+        if options['write_behind']:
+            overrides['COMMENT_WRITE_BEHIND'] = True
+            overrides['COMMENT_JOURNAL_PATH'] = os.path.join(
+                directory.name, 'comments.sqlite3'
+            )
+        try:
+            with override_settings(**overrides):
+                connection.creation.create_test_db(
+                    verbosity=0, autoclobber=True
+                )
+                try:
+                    result = run_write_benchmark(
+                        options['threads'], options['writes']
+                    )
+                finally:
+                    connection.creation.destroy_test_db(
+                        old_name, verbosity=0
+                    )
+        finally:
+            settings_dict['TEST']['NAME'] = old_test_name
+            settings_dict['OPTIONS'] = old_options
+            directory.cleanup()
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+        self.stdout.write(
+            f'{result["writes"]} записей из {result["threads"]} потоков '
+            f'за {result["time_s"]} с: {result["writes_per_s"]} в секунду, '
+            f'ошибок {result["errors"]}'
+        )
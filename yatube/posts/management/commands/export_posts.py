@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts.export import EXPORT_FORMATS, export_lines
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты и комментарии пользователя в JSON Lines или CSV, '
+        'не загружая историю в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=sorted(EXPORT_FORMATS), default='jsonl',
+            help='Формат выгрузки.'
+        )
+        parser.add_argument(
+            '--after', default=None,
+            help='Курсор последней полученной записи, чтобы продолжить.'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(username=options['username']).first()
+        if author is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        lines = export_lines(
+            author, options['format'], options['after'],
+            options['chunk_size']
+        )
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'a' if options['after'] else 'w',
+                  encoding='utf-8', newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from posts.writebehind import flush_comments
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит в базу комментарии из журнала отложенной записи, '
+        'например, перед остановкой или после выключения '
+        'COMMENT_WRITE_BEHIND.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Комментариев в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        saved = flush_comments(options['batch_size'])
+        self.stdout.write(f'Перенесено комментариев: {saved}')
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from core.cache import bump_version
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from posts.models import Post
+from posts.thumbnails import THUMBNAIL_VARIANTS, generate_thumbnail
+
+
+def run_job(job):
+    try:
+        return generate_thumbnail(*job)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Заранее нарезает миниатюры картинок всех постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Количество параллельных потоков.'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        batch_size = workers * 16
+        posts = Post.objects.exclude(image='').order_by('id')
+        last_id = 0
+        done = created = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                batch = list(
+                    posts.filter(id__gt=last_id)
+                    .values_list('id', 'image')[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+                jobs = [
+                    (image, geometry_string, dict(variant_options))
+                    for image in {image for _, image in batch}
+                    for geometry_string, variant_options in THUMBNAIL_VARIANTS
+                ]
+                created += sum(executor.map(run_job, jobs))
+                done += len(jobs)
+        if created:
+            # Один сброс кеша лент на весь прогон.
+            bump_version('feed')
+        self.stdout.write(
+            f'Обработано миниатюр: {done}, создано: {created}'
+        )
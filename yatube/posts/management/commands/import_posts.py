@@ -0,0 +1,47 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from posts.importing import Importer
+from posts.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии, группы и подписки из файла '
+        'JSON Lines пачками; после сбоя продолжает с чекпоинта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON Lines.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк сохранять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Забыть чекпоинт и читать файл с начала.'
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счетчики, ленты и поисковый индекс.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        importer = Importer(
+            options['path'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        if options['restart']:
+            ImportCheckpoint.objects.filter(source=importer.source).delete()
+        try:
+            stats = importer.run(derived=not options['skip_derived'])
+        except (OSError, ValidationError) as error:
+            raise CommandError(error)
+        self.stdout.write(
+            'Импортировано: ' + ', '.join(
+                f'{kind} {count}' for kind, count in stats.items()
+            ) + f' за {time.monotonic() - started:.1f} с'
+        )
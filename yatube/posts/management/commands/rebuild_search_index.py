@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает полнотекстовый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_index(options['batch_size'])
+        self.stdout.write('Поисковый индекс пересобран')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from posts.feeds import rebuild_timelines
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает посты по лентам подписок.'
+
+    def handle(self, *args, **options):
+        rebuild_timelines()
+        self.stdout.write(
+            f'Записей в лентах: {TimelineEntry.objects.count()}'
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from posts.stats import reconcile_profile_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики профилей и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей обрабатывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать количество расхождений.'
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_profile_stats(
+            options['batch_size'], options['dry_run']
+        )
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(f'{verb} расхождений: {fixed}')
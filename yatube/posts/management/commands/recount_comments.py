@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from posts.models import Post
+from posts.utils import actual_comment_count
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.comment_count и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Сколько id постов обрабатывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать количество расхождений.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual = actual_comment_count()
+        last_id = Post.objects.order_by('-id').values_list('id', flat=True)
+        last_id = last_id.first() or 0
+        fixed = 0
+        for start in range(0, last_id, batch_size):
+            drifted = (
+                Post.objects
+                .filter(id__gt=start, id__lte=start + batch_size)
+                .annotate(actual=actual)
+                .exclude(comment_count=F('actual'))
+                .values_list('id', flat=True)
+            )
+            if options['dry_run']:
+                fixed += drifted.count()
+                continue
+            with transaction.atomic():
+                fixed += Post.objects.filter(id__in=list(drifted)).update(
+                    comment_count=actual
+                )
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(f'{verb} расхождений: {fixed}')
@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу сгенерированными пользователями, группами, '
+        'постами, комментариями и подписками.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ('users', 1000, 'Количество пользователей.'),
+            ('groups', 20, 'Количество групп.'),
+            ('posts', 10000, 'Количество постов.'),
+            ('comments', 30000, 'Количество комментариев.'),
+            ('follows', 20000, 'Количество подписок (до удаления повторов).'),
+        ):
+            parser.add_argument(f'--{name}', type=int, default=default,
+                                help=help_text)
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1.'
+        )
+        parser.add_argument(
+            '--author-skew', type=float, default=1.1,
+            help='Показатель закона Ципфа для авторов постов.'
+        )
+        parser.add_argument(
+            '--follow-skew', type=float, default=1.1,
+            help='Показатель закона Ципфа для авторов в подписках.'
+        )
+        parser.add_argument(
+            '--comment-skew', type=float, default=1.2,
+            help='Показатель закона Ципфа для комментируемых постов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить даты.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed генератора: одинаковый seed дает одинаковые данные.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Количество процессов-генераторов, по умолчанию по числу CPU.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк сохранять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счетчики, ленты и поисковый индекс.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        seeder = Seeder(
+            seed=options['seed'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            images=options['images'],
+            author_skew=options['author_skew'],
+            follow_skew=options['follow_skew'],
+            comment_skew=options['comment_skew'],
+            days=options['days'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        seeder.run(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            derived=not options['skip_derived'],
+        )
+        self.stdout.write(
+            f'База наполнена за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,86 @@
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+# Схема и заполнение индекса на момент этой миграции. Код posts.search
+# может меняться, поэтому здесь его копия.
+WORD_RE = re.compile(r'\w+')
+
+CREATE_SQL = {
+    'sqlite': (
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        "title, body, post_id UNINDEXED, tokenize = 'unicode61')",
+    ),
+    'postgresql': (
+        'CREATE TABLE posts_search ('
+        'rowid bigint PRIMARY KEY, post_id integer NOT NULL, '
+        'document tsvector NOT NULL)',
+        'CREATE INDEX posts_search_document_idx '
+        'ON posts_search USING gin (document)',
+    ),
+}
+
+POSTGRES_FILL_SQL = (
+    'INSERT INTO posts_search (rowid, post_id, document) '
+    "SELECT -id, id, setweight(to_tsvector('russian', "
+    "COALESCE(title, '')), 'A') || setweight(to_tsvector('russian', text), "
+    "'B') FROM posts_post",
+    'INSERT INTO posts_search (rowid, post_id, document) '
+    "SELECT id, post_id, setweight(to_tsvector('russian', ''), 'A') "
+    "|| setweight(to_tsvector('russian', text), 'C') FROM posts_comment",
+)
+
+
+def fill_sqlite(cursor):
+    """Основы слов считает стеммер Snowball: в SQL его нет."""
+    stemmer = snowballstemmer.stemmer('russian')
+
+    def stem(text):
+        return ' '.join(stemmer.stemWords(WORD_RE.findall(text.lower())))
+
+    cursor.execute('SELECT id, title, text FROM posts_post')
+    rows = [
+        (-post_id, stem(title or ''), stem(text), post_id)
+        for post_id, title, text in cursor.fetchall()
+    ]
+    cursor.execute('SELECT id, post_id, text FROM posts_comment')
+    rows += [
+        (comment_id, '', stem(text), post_id)
+        for comment_id, post_id, text in cursor.fetchall()
+    ]
+    cursor.executemany(
+        'INSERT INTO posts_search (rowid, title, body, post_id) '
+        'VALUES (%s, %s, %s, %s)',
+        rows
+    )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        return
+    for sql in CREATE_SQL[vendor]:
+        schema_editor.execute(sql)
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            fill_sqlite(cursor)
+        else:
+            for sql in POSTGRES_FILL_SQL:
+                cursor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:36
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated(apps, schema_editor):
+    for name in ('Post', 'Comment'):
+        apps.get_model('posts', name).objects.update(updated=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_comment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(backfill_updated, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+import hashlib
+
 from core.models import CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -61,16 +65,47 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
     )
 
     class Meta:
         ordering = ('-created',)
         default_related_name = 'posts'
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='post_created_idx'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def card_version(self):
+        """Меняется вместе с любыми данными, которые выводит карточка."""
+        group = (self.group.slug, self.group.title) if self.group else None
+        raw = repr((
+            self.title, self.text, self.image.name, self.comment_count,
+            self.author.username, group,
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -93,6 +128,12 @@ class Comment(CreatedModel):
     class Meta:
         ordering = ('-created',)
         default_related_name = 'comments'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -114,3 +155,81 @@ class Follow(models.Model):
                 name='unique_author_user'
             ),
         ]
+        indexes = [
+            models.Index(fields=['user', 'author'], name='follow_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Строка ленты подписок: пост автора, на которого подписан user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_user_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx'
+            ),
+        ]
+
+
+class HeavyAuthor(models.Model):
+    """Автор с большим числом подписчиков.
+
+    Его посты не раскладываются по лентам, а подмешиваются при чтении.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='heavy'
+    )
+
+
+class ProfileStats(models.Model):
+    """Счетчики профиля пользователя.
+
+    Меняются вместе с постами, комментариями и подписками; команда
+    reconcile_profile_stats пересчитывает их заново.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+
+class ImportCheckpoint(models.Model):
+    """Позиция в файле import_posts или в журнале комментариев.
+
+    Сохраняется в одной транзакции с пачкой строк, поэтому после сбоя
+    загрузка продолжается ровно с первой несохраненной строки.
+    """
+    source = models.CharField('Источник', max_length=255, unique=True)
+    offset = models.BigIntegerField('Смещение в байтах', default=0)
+    lines = models.BigIntegerField('Прочитано строк', default=0)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+
+    def __str__(self):
+        return f'{self.source}: {self.lines}'
@@ -0,0 +1,16 @@
+"""Правила доступа, общие для страниц и API."""
+
+
+def can_edit_post(user, post):
+    """Пост правит только его автор."""
+    return user.is_authenticated and post.author_id == user.id
+
+
+def can_delete_comment(user, comment):
+    """Комментарий удаляет только его автор."""
+    return user.is_authenticated and comment.author_id == user.id
+
+
+def can_export_profile(user, author):
+    """Выгружать историю может сам автор или сотрудник."""
+    return user.is_authenticated and (user.id == author.id or user.is_staff)
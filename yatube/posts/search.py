@@ -0,0 +1,268 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс хранится в таблице posts_search: по строке на пост (заголовок и
+текст) и на каждый комментарий. Строка поста имеет ключ -post.id,
+строка комментария — comment.id. В SQLite это виртуальная таблица FTS5,
+слова в ней и в запросе приводятся к основе стеммером Snowball.
+В PostgreSQL — tsvector со словарем russian и GIN-индексом.
+"""
+import math
+import re
+from itertools import chain, islice
+
+import snowballstemmer
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+
+from .models import Comment, Post
+from .utils import KeysetPaginator, pack_cursor, unpack_cursor
+
+SEARCH_TABLE = 'posts_search'
+
+WORD_RE = re.compile(r'\w+')
+
+stemmer = snowballstemmer.stemmer('russian')
+
+
+def post_key(post_id):
+    return -post_id
+
+
+class SQLiteSearch:
+    create_sql = (
+        f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+        "title, body, post_id UNINDEXED, tokenize = 'unicode61')",
+    )
+    drop_sql = (f'DROP TABLE IF EXISTS {SEARCH_TABLE}',)
+    match_sql = f'{SEARCH_TABLE} MATCH %s'
+
+    def matches(self, query):
+        # bm25() работает только в запросе к самой таблице FTS5:
+        # LIMIT -1 не дает SQLite слить подзапрос с GROUP BY.
+        return (
+            'SELECT post_id, MAX(score) AS score FROM ('
+            f'SELECT post_id, -bm25({SEARCH_TABLE}, 4.0, 1.0)'
+            ' * CASE WHEN rowid < 0 THEN 1.0 ELSE 0.5 END AS score'
+            f' FROM {SEARCH_TABLE} WHERE {self.match_sql} LIMIT -1'
+            ') GROUP BY post_id',
+            [query]
+        )
+
+    def stem(self, text):
+        return stemmer.stemWords(WORD_RE.findall(text.lower()))
+
+    def prepare(self, query):
+        """Запрос FTS5: все основы слов запроса, каждая в кавычках."""
+        return ' '.join(f'"{word}"' for word in self.stem(query))
+
+    def index(self, cursor, rows):
+        """Добавляет строки (key, post_id, title, body) одним executemany."""
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {SEARCH_TABLE} '
+            '(rowid, title, body, post_id) VALUES (%s, %s, %s, %s)',
+            [
+                (key, ' '.join(self.stem(title)), ' '.join(self.stem(body)),
+                 post_id)
+                for key, post_id, title, body in rows
+            ]
+        )
+
+
+class PostgresSearch:
+    create_sql = (
+        f'CREATE TABLE {SEARCH_TABLE} ('
+        'rowid bigint PRIMARY KEY, post_id integer NOT NULL, '
+        'document tsvector NOT NULL)',
+        f'CREATE INDEX {SEARCH_TABLE}_document_idx '
+        f'ON {SEARCH_TABLE} USING gin (document)',
+    )
+    drop_sql = (f'DROP TABLE IF EXISTS {SEARCH_TABLE}',)
+    match_sql = "document @@ plainto_tsquery('russian', %s)"
+
+    def matches(self, query):
+        return (
+            'SELECT post_id, MAX(ts_rank(document, plainto_tsquery('
+            "'russian', %s)))::float8 AS score "
+            f'FROM {SEARCH_TABLE} WHERE {self.match_sql} GROUP BY post_id',
+            [query, query]
+        )
+
+    def prepare(self, query):
+        return ' '.join(WORD_RE.findall(query))
+
+    def index(self, cursor, rows):
+        """Добавляет строки (key, post_id, title, body) одним executemany."""
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, post_id, document) '
+            "VALUES (%s, %s, setweight(to_tsvector('russian', %s), 'A')"
+            " || setweight(to_tsvector('russian', %s), %s)) "
+            'ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document',
+            [
+                (key, post_id, title, body, 'B' if key < 0 else 'C')
+                for key, post_id, title, body in rows
+            ]
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearch,
+    'postgresql': PostgresSearch,
+}
+
+
+def get_backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'Полнотекстовый поиск не поддерживается для {vendor}'
+        )
+    return BACKENDS[vendor]()
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        get_backend().index(cursor, [
+            (post_key(post.id), post.id, post.title or '', post.text)
+        ])
+
+
+def index_comment(comment):
+    with connection.cursor() as cursor:
+        get_backend().index(cursor, [
+            (comment.id, comment.post_id, '', comment.text)
+        ])
+
+
+def unindex(*keys):
+    if not keys:
+        return
+    placeholders = ', '.join(['%s'] * len(keys))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            keys
+        )
+
+
+def fill_index(backend, cursor, posts, comments, batch_size=1000):
+    """Добавляет в индекс посты и комментарии из querysets пачками."""
+    posts = posts.order_by().values_list('id', 'title', 'text')
+    rows = (
+        (post_key(post_id), post_id, title or '', text)
+        for post_id, title, text in posts.iterator(chunk_size=batch_size)
+    )
+    comments = comments.order_by().values_list('id', 'post_id', 'text')
+    rows = chain(rows, (
+        (comment_id, post_id, '', text)
+        for comment_id, post_id, text
+        in comments.iterator(chunk_size=batch_size)
+    ))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        backend.index(cursor, batch)
+
+
+def rebuild_index(batch_size=1000):
+    """Заново собирает индекс по всем постам и комментариям."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        fill_index(get_backend(), cursor, Post.objects.all(),
+                   Comment.objects.all(), batch_size)
+
+
+def matches_sql(query):
+    """SQL с post_id и score постов, подходящих под запрос.
+
+    Возвращает пару (sql, params) или None для пустого запроса.
+    """
+    backend = get_backend()
+    query = backend.prepare(query)
+    if not query:
+        return None
+    return backend.matches(query)
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset постов только подходящие под запрос."""
+    backend = get_backend()
+    query = backend.prepare(query)
+    if not query:
+        return queryset.none()
+    # extra(), а не RawSQL: id__in=RawSQL(...) оборачивает подзапрос
+    # в лишние скобки, и SQLite берет из него только первую строку.
+    return queryset.extra(
+        where=[
+            f'{Post._meta.db_table}.id IN (SELECT post_id '
+            f'FROM {SEARCH_TABLE} WHERE {backend.match_sql})'
+        ],
+        params=[query]
+    )
+
+
+class SearchPaginator(KeysetPaginator):
+    """Пагинатор результатов поиска.
+
+    Посты идут по убыванию релевантности score, при равной
+    релевантности — по убыванию id. Курсор хранит пару (score, id).
+    """
+
+    def __init__(self, object_list, per_page, query='', **kwargs):
+        self.matches = matches_sql(query)
+        super().__init__(object_list, per_page, **kwargs)
+
+    def _fetch(self, limit, position=None, reverse=False, offset=0):
+        if self.matches is None:
+            return []
+        sql, params = self.matches
+        params = list(params)
+        sql = f'SELECT post_id, score FROM ({sql}) AS matches'
+        if position is not None:
+            lookup = '>' if reverse else '<'
+            sql += (
+                f' WHERE score {lookup} %s'
+                f' OR (score = %s AND post_id {lookup} %s)'
+            )
+            params += [position[0], position[0], position[1]]
+        direction = 'ASC' if reverse else 'DESC'
+        sql += (
+            f' ORDER BY score {direction}, post_id {direction}'
+            ' LIMIT %s OFFSET %s'
+        )
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        posts = self.object_list.in_bulk([post_id for post_id, _ in rows])
+        result = []
+        for post_id, score in rows:
+            if post_id in posts:
+                posts[post_id].search_score = score
+                result.append(posts[post_id])
+        return result
+
+    def _count(self, limit=None):
+        if self.matches is None:
+            return 0
+        sql, params = self.matches
+        params = list(params)
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql}) AS matches', params)
+            return cursor.fetchone()[0]
+
+    def encode_cursor(self, post):
+        return pack_cursor(repr(post.search_score), post.id)
+
+    def decode_cursor(self, cursor):
+        try:
+            score, pk = unpack_cursor(cursor)
+            score, pk = float(score), int(pk)
+        except (TypeError, ValueError):
+            return None
+        if not math.isfinite(score):
+            return None
+        return score, pk
@@ -0,0 +1,271 @@
+"""Генерация больших объемов данных для нагрузочных тестов.
+
+Строки генерируются пачками в пуле процессов: у каждой пачки свой
+seed, поэтому результат зависит только от общего seed, а не от числа
+процессов. Основной процесс сохраняет пачки через bulk_create, каждую
+в своей транзакции. Авторы постов, авторы на которых подписываются и
+посты, которые комментируют, выбираются по закону Ципфа: вес элемента
+с рангом r равен 1 / r ** skew.
+"""
+import multiprocessing
+import os
+import random
+from bisect import bisect
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+import django
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from .derived import explicit_created, rebuild_derived
+from .models import Comment, Follow, Group, Post, User
+
+IMAGE_COLORS = 64
+
+_state = {}
+
+
+def zipf_cum_weights(size, skew):
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(size)))
+
+
+def zipf_choice(rng, population, cum_weights):
+    """Случайный элемент population с весами Ципфа."""
+    index = bisect(cum_weights, rng.random() * cum_weights[-1])
+    return population[min(index, len(population) - 1)]
+
+
+def init_worker(state):
+    if not apps.ready:
+        django.setup()
+    _state.clear()
+    _state.update(state)
+    for name, skew in state.get('skews', {}).items():
+        _state[f'{name}_weights'] = zipf_cum_weights(
+            len(state[name]), skew
+        )
+
+
+def chunk_random(kind, index):
+    seed = f'{_state["seed"]}:{_state["offset"]}:{kind}:{index}'
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    return random.Random(seed), fake
+
+
+def random_created(rng):
+    return _state['now'] - timedelta(seconds=rng.randrange(_state['period']))
+
+
+def make_image(rng):
+    """JPEG одного из IMAGE_COLORS цветов: одинаковые сохранятся один раз."""
+    color = rng.randrange(IMAGE_COLORS)
+    output = BytesIO()
+    Image.new('RGB', (320, 240), (color * 4, 255 - color * 4, 128)).save(
+        output, 'JPEG'
+    )
+    storage = Post._meta.get_field('image').storage
+    return storage.save('posts/seed.jpg', ContentFile(output.getvalue()))
+
+
+def generate_users(index, start, count):
+    rng, fake = chunk_random('users', index)
+    return [
+        {
+            'username': f'{fake.user_name()}_{number}'[:150],
+            'first_name': fake.first_name(),
+            'last_name': fake.last_name(),
+            'email': fake.email(),
+            'date_joined': random_created(rng),
+        }
+        for number in range(_state['offset'] + start,
+                            _state['offset'] + start + count)
+    ]
+
+
+def generate_groups(index, start, count):
+    rng, fake = chunk_random('groups', index)
+    return [
+        {
+            'title': f'{fake.word().capitalize()} {number}'[:200],
+            'slug': f'group-{number}',
+            'description': fake.paragraph(),
+        }
+        for number in range(_state['offset'] + start,
+                            _state['offset'] + start + count)
+    ]
+
+
+def generate_posts(index, start, count):
+    rng, fake = chunk_random('posts', index)
+    groups = _state['groups']
+    rows = []
+    for _ in range(count):
+        created = random_created(rng)
+        rows.append({
+            'author_id': zipf_choice(
+                rng, _state['users'], _state['users_weights']
+            ),
+            'group_id': rng.choice(groups) if groups and rng.random() < 0.7
+            else None,
+            'title': fake.sentence(nb_words=4)[:50],
+            'text': fake.text(max_nb_chars=rng.choice((200, 500, 1500))),
+            'image': make_image(rng) if rng.random() < _state['images']
+            else '',
+            'created': created,
+            'updated': created,
+        })
+    return rows
+
+
+def generate_comments(index, start, count):
+    rng, fake = chunk_random('comments', index)
+    rows = []
+    for _ in range(count):
+        created = random_created(rng)
+        rows.append({
+            'post_id': zipf_choice(
+                rng, _state['posts'], _state['posts_weights']
+            ),
+            'author_id': rng.choice(_state['users']),
+            'text': fake.sentence(nb_words=rng.randint(3, 30))[:500],
+            'created': created,
+            'updated': created,
+        })
+    return rows
+
+
+def generate_follows(index, start, count):
+    rng, _ = chunk_random('follows', index)
+    users = _state['users']
+    rows = []
+    for _ in range(count):
+        user_id = rng.choice(users)
+        author_id = zipf_choice(rng, _state['authors'],
+                                _state['authors_weights'])
+        if user_id != author_id:
+            rows.append({'user_id': user_id, 'author_id': author_id})
+    return rows
+
+
+GENERATORS = {
+    'users': generate_users,
+    'groups': generate_groups,
+    'posts': generate_posts,
+    'comments': generate_comments,
+    'follows': generate_follows,
+}
+
+
+def run_chunk(task):
+    kind, index, start, count = task
+    return GENERATORS[kind](index, start, count)
+
+
+class Seeder:
+    """Наполняет базу: run() генерирует строки и сохраняет их пачками."""
+
+    def __init__(self, seed=0, workers=None, batch_size=5000, images=0.0,
+                 author_skew=1.1, follow_skew=1.1, comment_skew=1.2,
+                 days=365, log=None):
+        self.seed = seed
+        self.workers = os.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.images = images
+        self.skews = {
+            'users': author_skew,
+            'authors': follow_skew,
+            'posts': comment_skew,
+        }
+        self.now = timezone.now()
+        self.period = max(1, days * 24 * 60 * 60)
+        self.log = log or (lambda message: None)
+
+    def state(self, **ids):
+        return {
+            'seed': self.seed,
+            'now': self.now,
+            'period': self.period,
+            'images': self.images,
+            'skews': {
+                name: skew for name, skew in self.skews.items() if name in ids
+            },
+            'groups': [],
+            'offset': 0,
+            **ids,
+        }
+
+    def chunks(self, kind, total, state):
+        """Пачки строк kind по порядку, сгенерированные в пуле процессов."""
+        tasks = [
+            (kind, index, start, min(self.batch_size, total - start))
+            for index, start in enumerate(range(0, total, self.batch_size))
+        ]
+        if self.workers <= 1:
+            init_worker(state)
+            yield from map(run_chunk, tasks)
+            return
+        with multiprocessing.Pool(
+            self.workers, initializer=init_worker, initargs=(state,)
+        ) as pool:
+            yield from pool.imap(run_chunk, tasks)
+
+    def load(self, model, kind, total, state, **options):
+        saved = 0
+        for rows in self.chunks(kind, total, state):
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    [model(**row) for row in rows], **options
+                )
+            saved += len(rows)
+            self.log(f'{kind}: {saved}/{total}')
+
+    def ids(self, model, since):
+        return list(
+            model.objects.filter(pk__gt=since).order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def run(self, users=1000, groups=20, posts=10000, comments=30000,
+            follows=20000, derived=True):
+        """Добавляет в базу заданное количество строк каждого вида."""
+        user_start, group_start = self.last_pk(User), self.last_pk(Group)
+        self.load(User, 'users', users, {
+            **self.state(), 'offset': user_start
+        })
+        self.load(Group, 'groups', groups, {
+            **self.state(), 'offset': group_start
+        })
+        user_ids = self.ids(User, 0)
+        group_ids = self.ids(Group, 0)
+        post_start = self.last_pk(Post)
+        with explicit_created(Post, Comment):
+            self.load(Post, 'posts', posts, {
+                **self.state(users=user_ids), 'groups': group_ids
+            })
+            post_ids = self.ids(Post, post_start)
+            if post_ids:
+                self.load(Comment, 'comments', comments,
+                          self.state(users=user_ids, posts=post_ids))
+        self.load(
+            Follow, 'follows', follows,
+            self.state(users=user_ids, authors=user_ids),
+            ignore_conflicts=True
+        )
+        if derived:
+            self.rebuild_derived()
+
+    def rebuild_derived(self):
+        """Пересчитывает данные, которые bulk_create обходит."""
+        rebuild_derived(self.batch_size, self.log)
@@ -0,0 +1,152 @@
+from core.cache import bump_version_on_commit
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .feeds import backfill_timeline, fan_out_post, prune_timeline
+from .images import release_image
+from .models import Comment, Follow, Group, Post
+from .search import index_comment, index_post, post_key, unindex
+from .stats import shift_profile_stats
+from .utils import shift_comment_count
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_stats_add(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shift_profile_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_stats_remove(sender, instance, **kwargs):
+    shift_profile_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_stats_add(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shift_profile_stats(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_stats_remove(sender, instance, **kwargs):
+    shift_profile_stats(instance.author_id, comments_count=-1)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_remember_post(sender, instance, raw=False, **kwargs):
+    instance._stored_post_id = None
+    if instance.pk and not raw:
+        instance._stored_post_id = (
+            Comment.objects
+            .filter(pk=instance.pk)
+            .values_list('post_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_add(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_post_id = getattr(instance, '_stored_post_id', None)
+    if created:
+        shift_comment_count(instance.post_id, 1)
+    elif old_post_id and old_post_id != instance.post_id:
+        shift_comment_count(old_post_id, -1)
+        shift_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_count_remove(sender, instance, **kwargs):
+    shift_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_stats_add(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shift_profile_stats(instance.author_id, followers_count=1)
+        shift_profile_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_stats_remove(sender, instance, **kwargs):
+    shift_profile_stats(instance.author_id, followers_count=-1)
+    shift_profile_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def post_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindex(sender, instance, **kwargs):
+    unindex(post_key(instance.id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindex(sender, instance, **kwargs):
+    unindex(instance.id)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_image(sender, instance, raw=False, **kwargs):
+    instance._stored_image = None
+    if instance.pk and not raw:
+        instance._stored_image = (
+            Post.objects
+            .filter(pk=instance.pk)
+            .values_list('image', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_release_replaced_image(sender, instance, **kwargs):
+    old_image = getattr(instance, '_stored_image', None)
+    if old_image and old_image != instance.image.name:
+        transaction.on_commit(lambda: release_image(old_image))
+
+
+@receiver(post_delete, sender=Post)
+def post_release_image(sender, instance, **kwargs):
+    image = instance.image.name
+    if image:
+        transaction.on_commit(lambda: release_image(image))
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_prune(sender, instance, **kwargs):
+    prune_timeline(instance.user_id, instance.author_id)
+
+
+@receiver((post_save, post_delete), sender=Post)
+@receiver((post_save, post_delete), sender=Comment)
+@receiver((post_save, post_delete), sender=Group)
+def feed_invalidate(sender, **kwargs):
+    bump_version_on_commit('feed')
+
+
+@receiver((post_save, post_delete), sender=Group)
+def groups_invalidate(sender, **kwargs):
+    bump_version_on_commit('groups')
@@ -0,0 +1,91 @@
+"""Версии страниц для условных GET-запросов (ETag и Last-Modified).
+
+Каждая функция дешево считает (etag, last_modified) страницы до ее
+рендеринга. В etag входит читатель: шапка, карандаш и кнопки
+подписки у каждого свои. Ленты берут версию «feed», которую сигналы
+меняют при любом изменении постов, комментариев и групп. Last-Modified
+не выставляется: в дату читателя не вписать, и If-Modified-Since
+вернул бы 304 после смены его подписки или входа на сайт.
+"""
+import hashlib
+
+from core.cache import get_version
+from core.concurrency import gather
+from django.db.models import DateTimeField, Max, OuterRef, Subquery
+
+from .models import Comment, Follow, Post, User
+from .stats import STATS_FIELDS, get_profile_stats
+from .writebehind import pending_comments
+
+
+def make_etag(request, *parts):
+    raw = repr((request.user.pk or 0, get_version('groups')) + parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_stamp(request, *args, **kwargs):
+    return make_etag(request, get_version('feed')), None
+
+
+def profile_rows(request, username):
+    """Автор, его статистика и подписка читателя.
+
+    Читаются один раз за запрос: сначала для etag, затем их берет view.
+    Автор None, если такого пользователя нет.
+    """
+    if not hasattr(request, '_profile_rows'):
+        author = User.objects.filter(username=username).first()
+        stats = following = None
+        if author is not None:
+            def is_following():
+                if not request.user.is_authenticated:
+                    return None
+                return Follow.objects.filter(
+                    author_id=author.id, user_id=request.user.id
+                ).exists()
+
+            stats, following = gather(
+                lambda: get_profile_stats(author), is_following
+            )
+        request._profile_rows = author, stats, following
+    return request._profile_rows
+
+
+def profile_stamp(request, username):
+    author, stats, following = profile_rows(request, username)
+    if author is None:
+        return None, None
+    return make_etag(
+        request, get_version('feed'), author.id, following,
+        *(getattr(stats, field) for field in STATS_FIELDS)
+    ), None
+
+
+def post_stamp(request, post_id):
+    """Версия поста: его updated и последнее изменение комментариев.
+
+    Добавление и удаление комментария меняют updated поста вместе
+    со счетчиком комментариев. Комментарии читателя из журнала
+    отложенной записи видны только ему и тоже входят в etag.
+    """
+    comments_updated = (
+        Comment.objects
+        .filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(last=Max('updated'))
+        .values('last')
+    )
+    row = (
+        Post.objects
+        .filter(id=post_id)
+        .annotate(comments_updated=Subquery(
+            comments_updated, output_field=DateTimeField()
+        ))
+        .values_list('updated', 'comments_updated', 'comment_count')
+        .first()
+    )
+    if row is None:
+        return None, None
+    pending = len(pending_comments(post_id, request.user))
+    return make_etag(request, *row, pending), None
@@ -0,0 +1,95 @@
+"""Счетчики профиля пользователя в одной строке ProfileStats."""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, ProfileStats, User
+
+STATS_FIELDS = (
+    'posts_count', 'followers_count', 'following_count', 'comments_count'
+)
+
+
+def count_subquery(queryset, field):
+    """Количество строк queryset, у которых field равно pk пользователя."""
+    counts = (
+        queryset
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def count_stats(users):
+    """Считает счетчики для queryset пользователей одним запросом."""
+    return users.order_by().annotate(
+        posts_count=count_subquery(Post.objects.all(), 'author'),
+        followers_count=count_subquery(Follow.objects.all(), 'author'),
+        following_count=count_subquery(Follow.objects.all(), 'user'),
+        comments_count=count_subquery(Comment.objects.all(), 'author'),
+    ).values('pk', *STATS_FIELDS)
+
+
+def shift_profile_stats(user_id, **deltas):
+    """Атомарно меняет счетчики пользователя на deltas."""
+    ProfileStats.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def get_profile_stats(user):
+    """Возвращает счетчики пользователя, при первом обращении считает их."""
+    try:
+        return user.stats
+    except ProfileStats.DoesNotExist:
+        pass
+    row = count_stats(User.objects.filter(pk=user.pk)).get()
+    stats, _ = ProfileStats.objects.get_or_create(
+        user=user,
+        defaults={field: row[field] for field in STATS_FIELDS}
+    )
+    return stats
+
+
+def reconcile_profile_stats(batch_size=1000, dry_run=False):
+    """Пересчитывает счетчики всех пользователей пачками по id.
+
+    Возвращает количество исправленных записей.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            User.objects
+            .filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return fixed
+        last_id = ids[-1]
+        with transaction.atomic():
+            current = ProfileStats.objects.select_for_update().in_bulk(ids)
+            to_create, to_update = [], []
+            for row in count_stats(User.objects.filter(pk__in=ids)):
+                stats = current.get(row['pk'])
+                if stats is None:
+                    to_create.append(ProfileStats(
+                        user_id=row['pk'],
+                        **{field: row[field] for field in STATS_FIELDS}
+                    ))
+                elif any(
+                    getattr(stats, field) != row[field]
+                    for field in STATS_FIELDS
+                ):
+                    for field in STATS_FIELDS:
+                        setattr(stats, field, row[field])
+                    to_update.append(stats)
+            fixed += len(to_create) + len(to_update)
+            if not dry_run:
+                ProfileStats.objects.bulk_create(to_create)
+                ProfileStats.objects.bulk_update(to_update, STATS_FIELDS)
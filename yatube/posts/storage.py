@@ -0,0 +1,47 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит каждый уникальный файл один раз под его хешем.
+
+    Имя файла — sha256 содержимого в каталоге upload_to, разбитом на
+    подкаталоги по первым символам хеша. Повторная загрузка того же
+    файла возвращает уже сохраненное имя и ничего не пишет.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def blob_name(self, directory, digest, ext):
+        return os.path.join(directory, digest[:2], digest[2:4], digest + ext)
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        upload_dir = self.path(directory)
+        os.makedirs(upload_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        tmp_path = os.path.join(upload_dir, f'.upload-{uuid.uuid4().hex}')
+        fd = os.open(tmp_path, self.OS_OPEN_FLAGS, 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+            name = self.blob_name(directory, hasher.hexdigest(), ext)
+            full_path = self.path(name)
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, full_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return name.replace('\\', '/')
@@ -0,0 +1,31 @@
+from django.test import TestCase
+from posts.benchmarks import (SCENARIOS, check_budgets, load_budgets,
+                              run_benchmarks, run_card_benchmark, seed)
+from posts.utils import print_func_info
+
+
+class BenchmarkBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        seed(scale=0.001, workers=0)
+
+    @print_func_info
+    def test_query_budgets(self):
+        """Количество запросов всех сценариев укладывается в бюджеты."""
+        results = run_benchmarks(repeat=1)
+        self.assertEqual(set(results), set(SCENARIOS))
+        budgets = {
+            name: {'queries': budget['queries']}
+            for name, budget in load_budgets().items()
+        }
+        self.assertEqual(check_budgets(results, budgets), [])
+
+    @print_func_info
+    def test_card_benchmark(self):
+        """Замер карточек рендерит обе версии и сравнивает время."""
+        result = run_card_benchmark(cards=3, repeat=2)
+        self.assertEqual(result['cards'], 3)
+        self.assertGreater(result['includes_ms'], 0)
+        self.assertGreater(result['render_post_card_ms'], 0)
+        self.assertGreater(result['memoized_ms'], 0)
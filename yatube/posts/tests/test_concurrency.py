@@ -0,0 +1,69 @@
+import threading
+
+from core.concurrency import gather
+from core.metrics import RequestMetrics, track_queries
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from posts.models import Follow, Post
+from posts.utils import print_func_info
+
+User = get_user_model()
+
+
+class GatherTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Parallel')
+        self.reader = User.objects.create_user(username='Reader')
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+
+    def count_in_thread(self, threads):
+        threads.append(threading.get_ident())
+        return Post.objects.count()
+
+    @print_func_info
+    def test_gather_runs_in_pool_and_keeps_wrappers(self):
+        """Задачи идут в пуле, а их SQL видят обертки вызывающего."""
+        threads = []
+        with track_queries(RequestMetrics()) as metrics:
+            results = gather(
+                lambda: self.count_in_thread(threads),
+                lambda: self.count_in_thread(threads),
+                lambda: 'готово'
+            )
+        self.assertEqual(results, [12, 12, 'готово'])
+        self.assertEqual(len(set(threads)), 2)
+        self.assertEqual(metrics.queries, 2)
+
+    @print_func_info
+    def test_gather_inline_in_transaction_or_without_workers(self):
+        """В транзакции и без пула задачи выполняются в текущем потоке."""
+        threads = []
+        with transaction.atomic():
+            gather(*[lambda: self.count_in_thread(threads)] * 2)
+        with override_settings(VIEW_QUERY_WORKERS=0):
+            gather(*[lambda: self.count_in_thread(threads)] * 2)
+        self.assertEqual(set(threads), {threading.get_ident()})
+
+    @print_func_info
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_profile_with_parallel_queries(self):
+        """Профиль собирается из параллельных запросов без потерь."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:profile', args=(self.author.username,))
+        response = client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertEqual(response.context['stats'].posts_count, 12)
+        self.assertTrue(response.context['following'])
+        response = client.get(url, {
+            'after': response.context['page_obj'].next_cursor, 'page': 2
+        })
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertFalse(response.context['page_obj'].has_next())
@@ -0,0 +1,113 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Group, Post
+from posts.utils import print_func_info
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Exporter')
+        cls.other = User.objects.create_user(username='Stranger')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+            for number in range(3)
+        ]
+        foreign = Post.objects.create(author=cls.other, text='Чужой пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=foreign, author=cls.author, text=f'Комментарий {number}'
+            )
+            for number in range(2)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Не его комментарий'
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(ExportTests.author)
+        self.url = reverse('posts:profile_export', args=('Exporter',))
+
+    def export(self, **params):
+        response = self.author_client.get(self.url, params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    @print_func_info
+    def test_jsonl_streams_posts_then_comments(self):
+        """JSON Lines содержит посты, затем комментарии автора."""
+        records = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.id) for post in self.posts]
+            + [('comment', comment.id) for comment in self.comments]
+        )
+        self.assertEqual(records[0]['group'], self.group.slug)
+        self.assertEqual(records[-1]['text'], 'Комментарий 1')
+
+    @print_func_info
+    def test_export_resumes_from_cursor(self):
+        """Выгрузка продолжается после курсора полученной записи."""
+        records = [json.loads(line) for line in self.export().splitlines()]
+        for index, record in enumerate(records):
+            with self.subTest(index=index):
+                rest = [
+                    json.loads(line)
+                    for line in self.export(after=record['cursor'])
+                    .splitlines()
+                ]
+                self.assertEqual(rest, records[index + 1:])
+
+    @print_func_info
+    def test_csv_export(self):
+        """CSV начинается с заголовка, продолжение — без него."""
+        rows = list(csv.DictReader(StringIO(self.export(format='csv'))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['text'], 'Пост 0')
+        rest = self.export(format='csv', after=rows[3]['cursor'])
+        self.assertEqual(len(rest.splitlines()), 1)
+        self.assertIn('Комментарий 1', rest)
+
+    @print_func_info
+    def test_export_is_private(self):
+        """Чужую историю выгрузить нельзя, гостя просят войти."""
+        stranger = Client()
+        stranger.force_login(self.other)
+        self.assertEqual(stranger.get(self.url).status_code, 403)
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            self.author_client.get(self.url, {'format': 'xml'}).status_code,
+            400
+        )
+
+    @print_func_info
+    def test_export_command(self):
+        """Команда export_posts пишет ту же выгрузку в файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.jsonl')
+            call_command(
+                'export_posts', 'Exporter', output=path, chunk_size=2
+            )
+            with open(path, encoding='utf-8') as exported:
+                self.assertEqual(exported.read(), self.export())
+        output = StringIO()
+        call_command('export_posts', 'Exporter', format='csv', stdout=output)
+        self.assertEqual(output.getvalue(), self.export(format='csv'))
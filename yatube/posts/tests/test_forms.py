@@ -1,13 +1,28 @@
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from posts.forms import PostForm
 from posts.models import Group, Post
 from posts.utils import print_func_info
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name, size, mode='RGB', image_format='JPEG', **options):
+    file_obj = BytesIO()
+    Image.new(mode, size).save(file_obj, image_format, **options)
+    return SimpleUploadedFile(name, file_obj.getvalue())
+
 
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -64,3 +79,103 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertTrue(Post.objects.filter(text=form_data['text']).exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_MAX_SIDE=100,
+    IMAGE_MAX_PIXELS=1_000_000,
+)
+class PostImageFormTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get_form(self, image):
+        return PostForm(data={'text': 'Пост с картинкой'}, files={
+            'image': image
+        })
+
+    @print_func_info
+    def test_large_image_is_normalized(self):
+        """Большая картинка уменьшается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        form = self.get_form(
+            make_image('photo.png', (400, 200), image_format='PNG', exif=exif)
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        image_file = form.cleaned_data['image']
+        self.assertEqual(image_file.name, 'photo.jpg')
+        with Image.open(image_file) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+
+    @print_func_info
+    def test_transparent_image_is_saved_as_webp(self):
+        """Картинка с прозрачностью сохраняется в WebP."""
+        form = self.get_form(
+            make_image('logo.png', (50, 50), 'RGBA', image_format='PNG')
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        image_file = form.cleaned_data['image']
+        self.assertEqual(image_file.name, 'logo.webp')
+        with Image.open(image_file) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.mode, 'RGBA')
+
+    @print_func_info
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с большим разрешением не проходит валидацию."""
+        form = self.get_form(make_image('big.jpg', (20, 20)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'too_many_pixels'
+        )
+
+    @print_func_info
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=10)
+    def test_too_large_file_rejected(self):
+        """Слишком большой файл не проходит валидацию."""
+        form = self.get_form(make_image('big.jpg', (20, 20)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'file_too_large'
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=100)
+class PostAdminFormTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass'
+        )
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(PostAdminFormTests.admin)
+
+    @print_func_info
+    def test_admin_adds_post(self):
+        """Админка создает пост с автором и обработанной картинкой."""
+        response = self.client.post(reverse('admin:posts_post_add'), {
+            'text': 'Пост из админки',
+            'author': self.author.pk,
+            'image': make_image('photo.png', (400, 200), image_format='PNG'),
+        })
+        self.assertRedirects(response, reverse('admin:posts_post_changelist'))
+        post = Post.objects.get(text='Пост из админки')
+        self.assertEqual(post.author, self.author)
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 50))
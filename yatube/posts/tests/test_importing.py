@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from posts.importing import Importer
+from posts.models import (Comment, Follow, Group, ImportCheckpoint, Post,
+                          TimelineEntry, User)
+from posts.search import filter_posts
+from posts.utils import print_func_info
+
+RECORDS = [
+    {'type': 'group', 'slug': 'imported', 'title': 'Импорт'},
+    {'type': 'post', 'id': 501, 'author': 'alice', 'group': 'imported',
+     'text': 'Перенесенный пост про маяки',
+     'created': '2019-05-01T10:00:00Z'},
+    {'type': 'post', 'id': 502, 'author': 'bob', 'text': 'Второй пост'},
+    {'type': 'comment', 'id': 901, 'post': 501, 'author': 'bob',
+     'text': 'Комментарий'},
+    {'type': 'comment', 'post': 501, 'author': 'carol', 'text': 'Еще один'},
+    {'type': 'comment', 'post': 999, 'author': 'carol', 'text': 'Сирота'},
+    {'type': 'follow', 'user': 'bob', 'author': 'alice'},
+    {'type': 'follow', 'user': 'alice', 'author': 'alice'},
+]
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'import.jsonl')
+        self.write(RECORDS)
+
+    def write(self, records):
+        with open(self.path, 'w', encoding='utf-8') as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, **options):
+        call_command('import_posts', self.path, stdout=StringIO(), **options)
+
+    def assert_imported(self):
+        self.assertEqual(
+            sorted(User.objects.values_list('username', flat=True)),
+            ['alice', 'bob', 'carol']
+        )
+        self.assertEqual(Group.objects.get().slug, 'imported')
+        post = Post.objects.get(id=501)
+        self.assertEqual(post.author.username, 'alice')
+        self.assertEqual(post.group.slug, 'imported')
+        self.assertEqual(post.created.year, 2019)
+        self.assertEqual(post.updated, post.created)
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertTrue(Comment.objects.filter(id=901, post=post).exists())
+        self.assertEqual(Follow.objects.count(), 1)
+
+    @print_func_info
+    def test_import_rebuilds_derived_data(self):
+        """Импорт сохраняет записи и пересчитывает производные данные."""
+        self.run_import(batch_size=3)
+        self.assert_imported()
+        alice = User.objects.get(username='alice')
+        self.assertEqual(alice.stats.posts_count, 1)
+        self.assertEqual(alice.stats.followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='bob', post_id=501
+        ).exists())
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), 'маяк')),
+            [Post.objects.get(id=501)]
+        )
+        self.assertFalse(alice.has_usable_password())
+
+    @print_func_info
+    def test_import_resumes_after_failure(self):
+        """После сбоя импорт продолжается с чекпоинта без дублей."""
+        save = Importer.save
+        calls = []
+
+        def failing_save(importer, batch):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise OSError('Диск отвалился')
+            return save(importer, batch)
+
+        with mock.patch.object(Importer, 'save', failing_save):
+            with self.assertRaises(CommandError):
+                self.run_import(batch_size=3)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.lines, 3)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.run_import(batch_size=3)
+        self.assert_imported()
+        self.run_import(batch_size=3)
+        self.assert_imported()
+
+    @print_func_info
+    def test_broken_line_stops_import(self):
+        """Битая строка останавливает импорт с ее номером."""
+        with open(self.path, 'a', encoding='utf-8') as output:
+            output.write('{не json\n')
+        with self.assertRaisesMessage(CommandError, 'Строка 9'):
+            self.run_import()
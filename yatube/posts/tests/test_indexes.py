@@ -0,0 +1,96 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.groups import get_registry
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import encode_cursor, print_func_info
+
+User = get_user_model()
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+$')
+
+
+def explain(sql):
+    """Возвращает строки плана запроса для текущей СУБД."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0].strip() for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """Находит в плане полный просмотр таблицы или сортировку."""
+    if connection.vendor == 'postgresql':
+        return [
+            line for line in plan
+            if 'Seq Scan on posts_' in line
+            or re.match(r'(->\s+)?Sort\b', line)
+        ]
+    return [
+        line for line in plan
+        if SQLITE_FULL_SCAN.match(line) or 'TEMP B-TREE' in line
+    ]
+
+
+class IndexUsageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='IndexAuthor')
+        cls.reader = User.objects.create_user(username='IndexReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='index-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(25):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(IndexUsageTests.reader)
+
+    @print_func_info
+    def test_views_queries_use_indexes(self):
+        """Запросы страниц читают данные по индексам, без сортировки."""
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('EXPLAIN проверяется только для SQLite и PostgreSQL')
+        cursor = encode_cursor(Post.objects.order_by('-created', '-id')[9])
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+        )
+        requests = [(url, {'page': 2}) for url in urls]
+        requests += [(url, {'page': 2, 'after': cursor}) for url in urls]
+        requests.append(
+            (reverse('posts:post_detail', args=(self.post.id,)), {})
+        )
+        for url, params in requests:
+            cache.clear()
+            # Реестр групп читается целиком один раз на версию.
+            get_registry()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, params)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                with self.subTest(url=url, params=params, sql=sql):
+                    self.assertEqual(plan_problems(explain(sql)), [])
@@ -0,0 +1,84 @@
+import json
+
+from core.metrics import registry
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+from posts.utils import print_func_info
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Measured')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        registry.reset()
+
+    def series(self, metric):
+        return getattr(registry, metric).series[('posts:post_detail',)]
+
+    @print_func_info
+    def test_request_is_recorded_by_view(self):
+        """Запрос попадает в гистограммы под именем своего view."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        self.assertEqual(registry.requests.series, {('posts:post_detail',): 1})
+        _, total = self.series('db_queries')
+        self.assertGreater(total, 0)
+        self.assertGreater(self.series('template_duration')[1], 0)
+        self.assertEqual(self.series('response_size')[1],
+                         len(response.content))
+        self.assertGreater(
+            registry.cache_misses.series[('posts:post_detail',)], 0
+        )
+
+    @print_func_info
+    def test_cache_hits_are_counted(self):
+        """Повторная карточка поста читается из кеша и считается попаданием."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.client.get(url)
+        self.client.get(url)
+        self.assertGreater(
+            registry.cache_hits.series[('posts:post_detail',)], 0
+        )
+
+    @override_settings(METRICS_LOG_SAMPLE_RATE=1.0)
+    @print_func_info
+    def test_sampled_request_is_logged_as_json(self):
+        """Попавший в выборку запрос пишется в лог одной JSON-строкой."""
+        client = Client()
+        with self.assertLogs('yatube.metrics', 'INFO') as logs:
+            client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+
+    @print_func_info
+    def test_metrics_endpoint_renders_prometheus_text(self):
+        """/metrics отдает гистограммы в формате Prometheus."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_db_queries_bucket{view="posts:index",le="+Inf"} 1', text
+        )
+        self.assertIn('yatube_requests_total{view="posts:index"} 1', text)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    @print_func_info
+    def test_metrics_endpoint_is_restricted(self):
+        """/metrics недоступен с адресов не из METRICS_ALLOWED_IPS."""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
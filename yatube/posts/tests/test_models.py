@@ -1,11 +1,33 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from posts.utils import print_func_info
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from posts.utils import print_func_info, save_post
+from sorl.thumbnail import get_thumbnail
 
 from ..models import Group, Post
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class PostModelTest(TestCase):
     @classmethod
@@ -54,3 +76,99 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_DEFERRED=False)
+class PostImageStorageTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ImageOwner')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, content_type='image/gif')
+        )
+
+    def stored_files(self):
+        return [
+            name
+            for _, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+            for name in files
+        ]
+
+    @print_func_info
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с общей миниатюрой."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/\w\w/\w\w/\w{64}\.gif$')
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(
+            get_thumbnail(first.image, '10x10').name,
+            get_thumbnail(second.image, '10x10').name
+        )
+
+    @print_func_info
+    def test_image_deleted_with_last_post(self):
+        """Файл удаляется вместе с последним постом с этой картинкой."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        thumbnail = get_thumbnail(first.image, '10x10')
+        first.delete()
+        self.assertTrue(second.image.storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(second.image.storage.exists(second.image.name))
+        self.assertFalse(thumbnail.exists())
+
+    @print_func_info
+    def test_replaced_image_deleted(self):
+        """При замене картинки старый файл удаляется."""
+        post = self.create_post('first.gif')
+        old_name = post.image.name
+        post.image = SimpleUploadedFile(
+            'second.gif', SMALL_GIF + b'\x00', content_type='image/gif'
+        )
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertEqual(len(self.stored_files()), 1)
+
+    @print_func_info
+    def test_release_waits_for_upload_of_same_image(self):
+        """Удаление последнего поста не стирает файл, который загружают."""
+        old = self.create_post('first.gif')
+        storage = old.image.storage
+        stored = threading.Event()
+        resume = threading.Event()
+        save = storage._save
+
+        def paused_save(name, content):
+            name = save(name, content)
+            stored.set()
+            resume.wait(5)
+            return name
+
+        post = Post(
+            author=self.user, text='Та же картинка',
+            image=SimpleUploadedFile(
+                'again.gif', SMALL_GIF, content_type='image/gif'
+            )
+        )
+        with mock.patch.object(storage, '_save', paused_save):
+            upload = threading.Thread(target=save_post, args=(post,))
+            upload.start()
+            stored.wait(5)
+            release = threading.Thread(target=old.delete)
+            release.start()
+            time.sleep(0.2)
+            resume.set()
+            upload.join()
+            release.join()
+        self.assertEqual(post.image.name, old.image.name)
+        self.assertTrue(storage.exists(post.image.name))
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from core import replicas
+from core.models import ReplicaHeartbeat
+from core.replicas import (REPLICA_PIN_COOKIE, ReplicaMiddleware,
+                           ReplicaRouter, copy_database, replica_lag)
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Follow, Post
+from posts.utils import print_func_info
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        replicas._health.clear()
+        self.addCleanup(replicas._health.clear)
+        patcher = mock.patch.object(replicas, 'replica_lag', return_value=1)
+        self.replica_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False):
+        """База для чтений во время запроса и ответ middleware."""
+        seen = []
+
+        def view(request):
+            seen.append(ReplicaRouter().db_for_read(Post))
+            if write:
+                ReplicaRouter().db_for_write(Post)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return seen[0], response
+
+    @print_func_info
+    def test_safe_requests_read_from_replica(self):
+        """GET читает с реплики, POST — с основной базы."""
+        alias, response = self.route(self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        alias, response = self.route(self.factory.post('/'))
+        self.assertEqual(alias, 'default')
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(ReplicaRouter().db_for_write(Post), 'default')
+
+    @print_func_info
+    def test_any_write_pins_primary(self):
+        """Запрос с записью закрепляет default, даже если это GET."""
+        for request in (self.factory.get('/'), self.factory.post('/')):
+            _, response = self.route(request, write=True)
+            self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    @print_func_info
+    def test_writer_reads_own_writes(self):
+        """После записи пользователь какое-то время читает с default."""
+        request = self.factory.get('/')
+        request.COOKIES[REPLICA_PIN_COOKIE] = '1'
+        alias, _ = self.route(request)
+        self.assertEqual(alias, 'default')
+
+    @print_func_info
+    def test_lagging_replica_falls_back_to_primary(self):
+        """Отстающая или недоступная реплика заменяется основной базой."""
+        self.replica_lag.return_value = 60
+        self.assertEqual(self.route(self.factory.get('/'))[0], 'default')
+        replicas._health.clear()
+        self.replica_lag.return_value = None
+        self.assertEqual(self.route(self.factory.get('/'))[0], 'default')
+
+    @print_func_info
+    def test_health_check_is_cached(self):
+        """Здоровье реплики проверяется не чаще REPLICA_CHECK_INTERVAL."""
+        for _ in range(3):
+            self.route(self.factory.get('/'))
+        self.assertEqual(self.replica_lag.call_count, 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaPinTests(TestCase):
+    @print_func_info
+    def test_follow_link_pins_primary(self):
+        """Подписка по GET-ссылке закрепляет чтения на default."""
+        reader = User.objects.create_user(username='Pinned')
+        author = User.objects.create_user(username='Followed')
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        response = client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=reader, author=author).exists()
+        )
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+
+class ReplicaLagTests(TestCase):
+    @print_func_info
+    def test_lag_from_heartbeat(self):
+        """Отставание считается по времени последней синхронизации."""
+        self.assertIsNone(replica_lag('default'))
+        ReplicaHeartbeat.objects.create(
+            beat=timezone.now() - timedelta(seconds=30)
+        )
+        self.assertAlmostEqual(replica_lag('default'), 30, delta=5)
+
+
+class CopyDatabaseTests(TransactionTestCase):
+    @print_func_info
+    def test_copy_replaces_replica_file(self):
+        """Копия основной базы подменяет файл реплики целиком."""
+        user = User.objects.create_user(username='Copied')
+        Post.objects.create(author=user, text='Пост на реплике')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        with open(path, 'w') as stale:
+            stale.write('старая копия')
+        copy_database(path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT text FROM posts_post').fetchall(),
+            [('Пост на реплике',)]
+        )
+        self.assertFalse(os.path.exists(f'{path}.sync'))
@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+from posts.models import Comment, Follow, Group, Post, User
+from posts.seeding import Seeder
+from posts.utils import print_func_info
+
+
+class SeedCommandTests(TestCase):
+    @print_func_info
+    def test_seed_creates_consistent_data(self):
+        """Команда seed создает данные с пересчитанными счетчиками."""
+        call_command(
+            'seed', users=20, groups=3, posts=200, comments=500,
+            follows=100, workers=0, batch_size=64, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 500)
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+        top = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(top.comment_count, top.comments.count())
+        self.assertGreater(top.comment_count, 500 / 200)
+        self.assertGreater(
+            Post.objects.values('created').distinct().count(), 1
+        )
+        self.assertTrue(
+            Post.objects.filter(created__lt=timezone.now()).exists()
+        )
+
+    @print_func_info
+    def test_chunks_do_not_depend_on_workers(self):
+        """Сгенерированные строки зависят только от seed."""
+        state = Seeder().state(users=list(range(1, 50)))
+        state['groups'] = [1, 2]
+        inline = list(Seeder(seed=7, workers=0, batch_size=10).chunks(
+            'posts', 35, {**state, 'seed': 7}
+        ))
+        pooled = list(Seeder(seed=7, workers=2, batch_size=10).chunks(
+            'posts', 35, {**state, 'seed': 7}
+        ))
+        self.assertEqual(inline, pooled)
+        self.assertEqual(sum(map(len, inline)), 35)
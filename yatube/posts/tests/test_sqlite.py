@@ -0,0 +1,73 @@
+from unittest import mock
+
+from core.cache import get_version
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from posts import signals, utils
+from posts.models import Comment, Post
+from posts.utils import print_func_info, save_comment, save_post
+
+User = get_user_model()
+
+
+class SqlitePragmaTests(TestCase):
+    @print_func_info
+    def test_pragmas_applied_on_connect(self):
+        """Прагмы SQLITE_PRAGMAS выставляются при подключении."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone(), (1,))
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone(), (-64 * 2 ** 10,))
+
+
+@override_settings(SQLITE_BUSY_BACKOFF=0)
+class WriteTransactionTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Writer')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.shift = utils.shift_comment_count
+        self.failures = 0
+
+    def locked_once(self, post_id, delta):
+        """Первый пересчет счетчика падает, как при занятой базе."""
+        if not self.failures:
+            self.failures += 1
+            raise OperationalError('database is locked')
+        self.shift(post_id, delta)
+
+    @print_func_info
+    def test_busy_write_is_retried(self):
+        """Занятая база не теряет запись: транзакция повторяется целиком."""
+        comment = Comment(post=self.post, author=self.user, text='Ответ')
+        with mock.patch.object(signals, 'shift_comment_count',
+                               self.locked_once):
+            save_comment(comment)
+        self.post.refresh_from_db()
+        self.assertEqual(self.failures, 1)
+        self.assertEqual(Comment.objects.get().id, comment.id)
+        self.assertEqual(self.post.comment_count, 1)
+
+    @print_func_info
+    def test_no_retry_inside_outer_transaction(self):
+        """Во внешней транзакции ошибка пробрасывается без повтора."""
+        comment = Comment(post=self.post, author=self.user, text='Ответ')
+        with mock.patch.object(signals, 'shift_comment_count',
+                               self.locked_once):
+            with self.assertRaises(OperationalError):
+                with transaction.atomic():
+                    save_comment(comment)
+        self.assertFalse(Comment.objects.exists())
+
+    @print_func_info
+    def test_feed_version_bumped_after_commit(self):
+        """Версия ленты меняется только после коммита записи."""
+        before = get_version('feed')
+        with transaction.atomic():
+            save_post(Post(author=self.user, text='Новый пост'))
+            save_comment(
+                Comment(post=self.post, author=self.user, text='Ответ')
+            )
+            self.assertEqual(get_version('feed'), before)
+        self.assertNotEqual(get_version('feed'), before)
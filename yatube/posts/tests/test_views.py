@@ -1,15 +1,30 @@
 import shutil
 import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
+from core.cache import page_cache_key
 from django import forms
 from django.conf import settings
+from django.contrib.admin import site
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Comment, Follow, Group, Post
-from posts.utils import print_func_info
+from posts.admin import PostAdmin
+from posts.groups import get_group_or_404, get_registry
+from posts.models import (Comment, Follow, Group, HeavyAuthor, Post,
+                          ProfileStats, TimelineEntry)
+from posts.thumbnails import (THUMBNAIL_VARIANTS, generate_thumbnail,
+                              refresh_thumbnail)
+from posts.utils import print_func_info, run_on_commit
 
 User = get_user_model()
 
@@ -155,13 +170,44 @@ class PostsPagesTests(TestCase):
     @print_func_info
     def test_check_cache(self):
         """Проверка кеша."""
+        cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
-        Post.objects.create(text='cach_check', author=self.user,)
         response2 = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response2.content)
-        cache.clear()
+        self.assertIsNone(response2.context)
+        with run_on_commit():
+            Post.objects.create(text='cach_check', author=self.user,)
         response_new = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response2.content, response_new.content)
+        self.assertContains(response_new, 'cach_check')
+
+    @print_func_info
+    def test_cache_serves_stale_page_during_rebuild(self):
+        """Пока страницу пересобирает другой запрос, отдается старая."""
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        with run_on_commit():
+            Post.objects.create(text='cach_check', author=self.user,)
+        request = RequestFactory().get(reverse('posts:index'))
+        request.user = AnonymousUser()
+        cache.add(f'{page_cache_key(request, "index_page")}:lock', 1)
+        response_stale = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_stale.content)
+
+    @print_func_info
+    def test_local_cache_version_expires(self):
+        """Правка без сброса версии видна после CACHE_VERSION_TIMEOUT."""
+        cache.clear()
+        self.guest_client.get(reverse('posts:index'))
+        # Версию сбросил бы другой процесс: здесь колбэк не запустится.
+        Post.objects.create(text='other_process', author=self.user)
+        self.assertNotContains(
+            self.guest_client.get(reverse('posts:index')), 'other_process'
+        )
+        expired = time.time() + settings.CACHE_VERSION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=expired):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'other_process')
 
     @print_func_info
     def test_follow_page(self):
@@ -189,6 +235,595 @@ class PostsPagesTests(TestCase):
         self.assertEqual(len(response.context["page_obj"]), 0)
 
 
+class CommentCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CommentCountTests.user)
+
+    @print_func_info
+    def test_comment_count_follows_add_and_delete(self):
+        """Счетчик комментариев меняется при добавлении и удалении."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment = Comment.objects.get(post=self.post)
+        self.authorized_client.get(
+            reverse('posts:comment_del', args=(comment.id,))
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    @print_func_info
+    def test_comment_count_follows_cascade_delete(self):
+        """Счетчик уменьшается, когда комментарий удаляется каскадом."""
+        commenter = User.objects.create_user(username='Leaving')
+        Comment.objects.create(post=self.post, author=commenter, text='A')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        commenter.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    @print_func_info
+    def test_recount_comments_repairs_drift(self):
+        """Команда recount_comments исправляет расхождения."""
+        Comment.objects.create(post=self.post, author=self.user, text='A')
+        Post.objects.filter(id=self.post.id).update(comment_count=7)
+        call_command('recount_comments', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+
+class PostCommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Thread')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostCommentsTests.user)
+        cache.clear()
+
+    def add_comments(self, count):
+        for number in range(count):
+            author = User.objects.create_user(
+                username=f'reader_{Comment.objects.count()}'
+            )
+            Comment.objects.create(
+                post=self.post, author=author, text=f'Комментарий {number}'
+            )
+
+    def detail_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(
+                reverse('posts:post_detail', args=(self.post.id,))
+            )
+        return len(queries)
+
+    @print_func_info
+    def test_post_detail_queries_do_not_grow_with_thread(self):
+        """Число запросов post_detail не зависит от числа комментариев."""
+        self.add_comments(2)
+        few = self.detail_queries()
+        self.add_comments(15)
+        self.assertEqual(self.detail_queries(), few)
+
+    @override_settings(COMMENTS_PAGE_SIZE=3)
+    @print_func_info
+    def test_comments_fragment_pages_by_cursor(self):
+        """Фрагмент комментариев листается по курсору в обе стороны."""
+        self.add_comments(7)
+        url = reverse('posts:post_comments', args=(self.post.id,))
+        for order, expected in (
+            ('newest', Comment.objects.order_by('-created', '-id')),
+            ('oldest', Comment.objects.order_by('created', 'id')),
+        ):
+            with self.subTest(order=order):
+                seen = []
+                params = {'order': order}
+                while True:
+                    response = self.client.get(url, params)
+                    seen += response.context['comments']
+                    if not response.context['next_cursor']:
+                        break
+                    params['after'] = response.context['next_cursor']
+                self.assertEqual(seen, list(expected))
+
+    @print_func_info
+    def test_comments_fragment_unknown_post(self):
+        """Фрагмент комментариев несуществующего поста возвращает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class GroupRegistryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='GroupAuthor')
+        cls.group = Group.objects.create(
+            title='Реестр', slug='registry', description='Описание'
+        )
+        cls.empty_group = Group.objects.create(
+            title='Пустая', slug='empty', description='Описание'
+        )
+        cls.old_post = Post.objects.create(
+            author=cls.user, text='Старый пост', group=cls.group
+        )
+        cls.new_post = Post.objects.create(
+            author=cls.user, text='Новый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    @print_func_info
+    def test_feeds_take_groups_from_registry(self):
+        """Ленты не читают группы из базы, когда реестр загружен."""
+        get_registry()
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, self.group.title)
+                self.assertFalse(any(
+                    'posts_group' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    @print_func_info
+    def test_group_save_refreshes_registry(self):
+        """Сохранение группы обновляет реестр."""
+        get_registry()
+        self.group.title = 'Переименованная'
+        with run_on_commit():
+            self.group.save()
+        self.assertEqual(
+            get_group_or_404(self.group.slug).title, 'Переименованная'
+        )
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+        self.assertContains(response, 'Переименованная')
+
+    @print_func_info
+    def test_group_from_other_process_is_found(self):
+        """Группа, сохраненная без сброса версии, находится по слагу."""
+        get_registry()
+        # Версию сбросил бы другой процесс: здесь колбэк не запустится.
+        Group.objects.create(title='Новая', slug='new', description='-')
+        response = self.client.get(reverse('posts:group_list', args=('new',)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('new', get_registry().by_slug)
+
+    @print_func_info
+    def test_unknown_group_is_404(self):
+        """Несуществующая группа возвращает 404."""
+        response = self.client.get(
+            reverse('posts:group_list', args=('missing',))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @print_func_info
+    def test_group_directory(self):
+        """Каталог показывает группы с числом постов и последним постом."""
+        response = self.client.get(reverse('posts:group_index'))
+        self.assertEqual(response.context['groups'], [
+            (self.empty_group, 0, None),
+            (self.group, 2, self.new_post),
+        ])
+        self.assertContains(response, self.new_post.text)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Validated')
+        cls.reader = User.objects.create_user(username='Revisitor')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    @print_func_info
+    def test_unchanged_pages_are_not_rendered(self):
+        """Неизменившиеся страницы отвечают 304 без рендеринга."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        ):
+            with self.subTest(url=url):
+                response = self.revalidate(url, self.client.get(url))
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    @print_func_info
+    def test_new_post_changes_feed(self):
+        """Новый пост меняет ETag ленты."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with run_on_commit():
+            Post.objects.create(author=self.author, text='Еще пост')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    @print_func_info
+    def test_follow_changes_profile(self):
+        """Подписка меняет ETag профиля."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        response = self.client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    @print_func_info
+    def test_etag_depends_on_viewer(self):
+        """ETag одной страницы различается у разных читателей."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        response = self.client.get(url)
+        self.assertEqual(
+            Client().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            .status_code,
+            200
+        )
+
+    @print_func_info
+    def test_post_detail_changes(self):
+        """Комментарии и правка меняют ETag поста, Last-Modified нет."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(
+            Client().get(
+                url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+            ).status_code,
+            200
+        )
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Комментарий'}
+        )
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        response = self.client.get(url)
+        comment = Comment.objects.get(post=self.post)
+        self.client.get(reverse('posts:comment_del', args=(comment.id,)))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+
+class ProfileStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='StatsAuthor')
+        cls.reader = User.objects.create_user(username='StatsReader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(ProfileStatsTests.reader)
+        cache.clear()
+
+    def get_stats(self, user):
+        response = self.reader_client.get(
+            reverse('posts:profile', args=(user.username,))
+        )
+        return response.context['stats']
+
+    @print_func_info
+    def test_stats_follow_writes(self):
+        """Счетчики профиля следуют за постами, комментариями и подписками."""
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.reader_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Комментарий'},
+        )
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        stats = self.get_stats(self.author)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count), (2, 1)
+        )
+        stats = self.get_stats(self.reader)
+        self.assertEqual(
+            (stats.following_count, stats.comments_count), (1, 1)
+        )
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.post.delete()
+        stats = self.get_stats(self.reader)
+        self.assertEqual(
+            (stats.following_count, stats.comments_count), (0, 0)
+        )
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+
+    @print_func_info
+    def test_profile_does_not_count_related_rows(self):
+        """Страница профиля не считает подписки и комментарии запросами."""
+        self.get_stats(self.author)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_stats(self.author)
+        counts = [
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+            and ('posts_follow' in query['sql']
+                 or 'posts_comment' in query['sql'])
+        ]
+        self.assertEqual(counts, [])
+
+    @print_func_info
+    def test_reconcile_profile_stats_repairs_drift(self):
+        """Команда reconcile_profile_stats исправляет расхождения."""
+        self.get_stats(self.author)
+        ProfileStats.objects.filter(user=self.author).update(
+            posts_count=7, followers_count=3
+        )
+        out = StringIO()
+        call_command('reconcile_profile_stats', batch_size=1, stdout=out)
+        self.assertIn('Исправлено расхождений: 2', out.getvalue())
+        stats = ProfileStats.objects.get(user=self.author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (1, 0))
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowFeedTests.reader)
+
+    def feed(self, **params):
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), params
+        )
+        return response.context['page_obj']
+
+    @print_func_info
+    def test_posts_fan_out_to_followers(self):
+        """Посты раскладываются по лентам и убираются при отписке."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(5)
+        )
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(list(self.feed()), [post])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(len(self.feed()), 0)
+
+    @print_func_info
+    def test_backfill_of_prolific_author(self):
+        """Подписка на автора с сотнями постов заполняет ленту целиком."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(600)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 600
+        )
+
+    @print_func_info
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_heavy_author_merged_on_read(self):
+        """Посты тяжелого автора подмешиваются в ленту при чтении."""
+        heavy = User.objects.create_user(username='Celebrity')
+        fan = User.objects.create_user(username='Fan')
+        Follow.objects.create(user=fan, author=heavy)
+        Follow.objects.create(user=self.reader, author=heavy)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(12):
+            Post.objects.create(
+                author=heavy if i % 2 else self.author, text=f'Пост {i}'
+            )
+        self.assertTrue(HeavyAuthor.objects.filter(author=heavy).exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=heavy).exists()
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(post__author=self.author).exists()
+        )
+        expected = list(Post.objects.order_by('-created', '-id'))
+        first = self.feed()
+        self.assertEqual(list(first), expected[:10])
+        second = self.feed(page=2, after=first.next_cursor)
+        self.assertEqual(list(second), expected[10:])
+
+    @print_func_info
+    @override_settings(FEED_FANOUT_LIMIT=2, FEED_BACKFILL_LIMIT=3)
+    def test_rebuild_timelines(self):
+        """Пересборка лент повторяет раскладку при записи."""
+        heavy = User.objects.create_user(username='Star')
+        fan = User.objects.create_user(username='Admirer')
+        for user in (fan, self.reader):
+            Follow.objects.create(user=user, author=heavy)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i}')
+            for i in range(5) for author in (self.author, heavy)
+        )
+        with CaptureQueriesContext(connection) as few:
+            call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(HeavyAuthor.objects.values_list('author', flat=True)),
+            [heavy.id]
+        )
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.reader)
+                .order_by('-created', '-post_id')
+                .values_list('post_id', flat=True)
+            ),
+            list(
+                Post.objects.filter(author=self.author)
+                .order_by('-created', '-id')
+                .values_list('id', flat=True)[:3]
+            )
+        )
+        for number in range(3):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'Reader{number}'),
+                author=self.author
+            )
+        with CaptureQueriesContext(connection) as many:
+            call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(len(few), len(many))
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CardAuthor')
+        cls.group = Group.objects.create(
+            title='Старое название',
+            slug='card-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст карточки', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostCardCacheTests.user)
+        self.url = reverse('posts:group_list', args=(self.group.slug,))
+
+    @print_func_info
+    def test_card_is_rendered_once(self):
+        """Повторный показ карточки берет ее из кеша."""
+        self.guest_client.get(self.url)
+        response = self.authorized_client.get(self.url)
+        self.assertTemplateNotUsed(response, 'includes/postcard.html')
+        self.assertTemplateUsed(response, 'includes/postpen.html')
+
+    @print_func_info
+    def test_pen_only_for_author(self):
+        """Карандаш из общего фрагмента виден только автору."""
+        edit_url = reverse('posts:post_edit', args=(self.post.id,))
+        self.assertContains(self.authorized_client.get(self.url), edit_url)
+        self.assertNotContains(self.guest_client.get(self.url), edit_url)
+
+    @print_func_info
+    def test_card_version_changes(self):
+        """Комментарии и переименование группы меняют карточку."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        self.guest_client.get(url)
+        Post.objects.filter(id=self.post.id).update(comment_count=42)
+        group = Group.objects.get(id=self.group.id)
+        group.title = 'Новое название'
+        with run_on_commit():
+            group.save()
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Новое название')
+        self.assertContains(response, '42')
+
+
+class PostCardLayoutTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='LayoutAuthor')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Длинная строка поста.\n' * 30
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(PostCardLayoutTests.user)
+
+    @print_func_info
+    def test_layouts(self):
+        """Лента обрезает текст, пост выводит его целиком, профиль сдвинут."""
+        more = 'читать далее'
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, more)
+        self.assertNotContains(response, 'margin-left: 30%')
+        response = self.client.get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        self.assertContains(response, more)
+        self.assertContains(response, 'margin-left: 30%')
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        self.assertNotContains(response, more)
+        self.assertContains(response, 'Длинная строка поста.<br>', count=30)
+
+    @print_func_info
+    def test_render_post_card_tag(self):
+        """Тег render_post_card рисует карточку с карандашом автора."""
+        request = RequestFactory().get('/')
+        request.user = PostCardLayoutTests.user
+        html = Template(
+            "{% load post_cards %}{% render_post_card post 'profile' %}"
+        ).render(Context({'post': self.post, 'request': request}))
+        self.assertIn(reverse('posts:post_edit', args=(self.post.id,)), html)
+        self.assertIn(
+            reverse('posts:profile', args=(self.user.username,)), html
+        )
+        request.user = AnonymousUser()
+        html = Template(
+            "{% load post_cards %}{% render_post_card post %}"
+        ).render(Context({'post': self.post, 'request': request}))
+        self.assertNotIn('class="pen"', html)
+        self.assertNotIn(
+            reverse('posts:post_edit', args=(self.post.id,)), html
+        )
+
+
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -228,6 +863,139 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    @print_func_info
+    def test_cursor_pages_match_offset_pages(self):
+        """Переход по курсору дает те же страницы, что и по номеру."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        cache.clear()
+        second = self.client.get(
+            reverse('posts:index'),
+            {'page': 2, 'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(second.number, 2)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            list(second),
+            list(Post.objects.order_by('-created', '-id')[10:])
+        )
+        cache.clear()
+        back = self.client.get(
+            reverse('posts:index'),
+            {'page': 1, 'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    @print_func_info
+    def test_previous_cursor_from_third_page(self):
+        """Ссылка «назад» с третьей страницы ведет на вторую."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(12)
+        )
+        pages = [self.client.get(reverse('posts:index')).context['page_obj']]
+        for number in (2, 3):
+            cache.clear()
+            pages.append(self.client.get(
+                reverse('posts:index'),
+                {'page': number, 'after': pages[-1].next_cursor}
+            ).context['page_obj'])
+        cache.clear()
+        back = self.client.get(
+            reverse('posts:index'),
+            {'page': 2, 'before': pages[2].previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(back.number, 2)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertTrue(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    @print_func_info
+    @override_settings(PAGINATOR_COUNT_LIMIT=5)
+    def test_bounded_count(self):
+        """Количество постов считается не дальше лимита."""
+        response = self.client.get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        paginator = response.context['page_obj'].paginator
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_is_exact)
+        self.assertTrue(response.context['page_obj'].has_next())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Searcher')
+        self.titled = Post.objects.create(
+            author=self.user, title='Котики', text='Про животных'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Мои котики гуляли во дворе'
+        )
+        self.commented = Post.objects.create(
+            author=self.user, text='Пост без ключевого слова'
+        )
+        self.comment = Comment.objects.create(
+            post=self.commented, author=self.user, text='Люблю котиков'
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    @print_func_info
+    def test_search_stems_and_ranks(self):
+        """Поиск находит формы слова и ставит совпадение в заголовке выше."""
+        self.assertEqual(
+            list(self.search('котик')),
+            [self.titled, self.post, self.commented]
+        )
+        self.assertEqual(list(self.search('гуляет')), [self.post])
+        self.assertEqual(len(self.search('собаки')), 0)
+        self.assertEqual(len(self.search('" OR *')), 0)
+
+    @print_func_info
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов и комментариев."""
+        self.post.text = 'Теперь про собак'
+        self.post.save()
+        self.comment.delete()
+        self.assertEqual(list(self.search('котики')), [self.titled])
+        self.assertEqual(list(self.search('собака')), [self.post])
+        self.titled.delete()
+        self.assertEqual(len(self.search('котики')), 0)
+
+    @print_func_info
+    def test_search_cursor_pagination(self):
+        """Результаты поиска листаются по курсору без повторов."""
+        for i in range(12):
+            Post.objects.create(author=self.user, text=f'Котики {i}')
+        first = self.search('котики')
+        second = self.search(
+            'котики', page=2, after=first.next_cursor
+        )
+        self.assertEqual(len(first) + len(second), 15)
+        self.assertFalse(set(first) & set(second))
+        back = self.search('котики', page=1, before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertContains(
+            self.client.get(reverse('posts:search'), {'q': 'котики'}),
+            'q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA%D0%B8&page=2'
+        )
+
+    @print_func_info
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты по индексу."""
+        request = RequestFactory().get('/')
+        results, _ = PostAdmin(Post, site).get_search_results(
+            request, Post.objects.all(), 'котиков'
+        )
+        self.assertEqual(
+            set(results), {self.titled, self.post, self.commented}
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('котики')), 3)
+
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -291,11 +1059,57 @@ class MediaPagesTests(TestCase):
         obj = response.context['post']
         self.assertEqual(obj.image, self.post.image)
 
+    @override_settings(THUMBNAIL_DEFERRED=True)
+    def test_thumbnail_is_deferred(self):
+        """Пока миниатюра не готова, отдается исходная картинка."""
+        url = reverse('posts:profile', args=(self.user,))
+        with mock.patch('posts.thumbnails.schedule_thumbnail') as schedule:
+            response = self.guest_client.get(url)
+        self.assertTrue(schedule.called)
+        self.assertContains(response, self.post.image.url)
+        for geometry_string, options in THUMBNAIL_VARIANTS:
+            generate_thumbnail(self.post.image, geometry_string, options)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, self.post.image.url)
+        self.assertContains(response, 'cache/')
+
+    @override_settings(THUMBNAIL_DEFERRED=True)
+    def test_finished_thumbnail_refreshes_cached_feed(self):
+        """Готовая миниатюра сбрасывает кеш ленты с исходной картинкой."""
+        url = reverse('posts:index')
+        with mock.patch('posts.thumbnails.schedule_thumbnail'):
+            response = self.guest_client.get(url)
+        self.assertContains(response, self.post.image.url)
+        for geometry_string, options in THUMBNAIL_VARIANTS:
+            refresh_thumbnail(self.post.image, geometry_string, options)
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_feed_is_reset_only_for_new_thumbnails(self):
+        """Кеш лент сбрасывается только созданием новых миниатюр."""
+        cache.clear()
+        with mock.patch('posts.thumbnails.bump_version') as bump:
+            for _ in range(2):
+                for geometry_string, options in THUMBNAIL_VARIANTS:
+                    refresh_thumbnail(
+                        self.post.image, geometry_string, options
+                    )
+        self.assertEqual(bump.call_count, len(THUMBNAIL_VARIANTS))
+        command = 'posts.management.commands.generate_thumbnails'
+        with mock.patch(f'{command}.generate_thumbnail',
+                        side_effect=[True, False]), \
+                mock.patch(f'{command}.bump_version') as bump:
+            call_command('generate_thumbnails', stdout=StringIO())
+        bump.assert_called_once_with('feed')
+
     def test_image_in_page(self):
         """Проверяем что пост с картинкой создается в БД"""
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст',
-                image='posts/small.gif'
+                image__regex=r'^posts/.*\.gif$'
             ).exists()
         )
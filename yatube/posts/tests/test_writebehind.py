@@ -0,0 +1,149 @@
+import os
+import sys
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import writebehind
+from posts.models import Comment, ImportCheckpoint, Post
+from posts.search import filter_posts
+from posts.stats import get_profile_stats
+from posts.utils import print_func_info
+from posts.writebehind import CommentJournal, flush_comments, get_journal
+
+User = get_user_model()
+
+
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Commenter')
+        cls.reader = User.objects.create_user(username='Bystander')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            COMMENT_WRITE_BEHIND=True,
+            COMMENT_JOURNAL_PATH=os.path.join(directory.name, 'journal'),
+            COMMENT_FLUSH_INTERVAL=0,
+            COMMENT_FLUSH_BATCH=2,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.post = Post.objects.create(author=self.reader, text='Вирусный')
+        self.client = Client()
+        self.client.force_login(WriteBehindTests.author)
+        self.detail = reverse('posts:post_detail', args=(self.post.id,))
+
+    def comment(self, text, post=None):
+        return self.client.post(
+            reverse('posts:add_comment', args=((post or self.post).id,)),
+            {'text': text}
+        )
+
+    @print_func_info
+    def test_comment_waits_in_journal_but_author_sees_it(self):
+        """Комментарий ждет в журнале, а автор сразу видит его в ветке."""
+        etag = self.client.get(self.detail)['ETag']
+        self.comment('Про маяки')
+        self.assertFalse(Comment.objects.exists())
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Про маяки')
+        self.assertContains(response, 'публикуется')
+        reader = Client()
+        reader.force_login(WriteBehindTests.reader)
+        self.assertNotContains(reader.get(self.detail), 'Про маяки')
+
+    @print_func_info
+    def test_flush_saves_batches_with_counters(self):
+        """Журнал переносится пачками вместе со счетчиками и индексом."""
+        stats = get_profile_stats(self.author)
+        for number in range(5):
+            self.comment(f'Маяк {number}')
+        self.assertEqual(flush_comments(), 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 5)
+        stats.refresh_from_db()
+        self.assertEqual(stats.comments_count, 5)
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), 'маяк')), [self.post]
+        )
+        self.assertEqual(get_journal().rows(0, 10), [])
+        response = self.client.get(self.detail)
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertNotContains(response, 'публикуется')
+
+    @print_func_info
+    def test_flush_after_crash_does_not_duplicate(self):
+        """Сбой до очистки журнала не сохраняет комментарии дважды."""
+        for number in range(3):
+            self.comment(f'Ответ {number}')
+        with mock.patch.object(CommentJournal, 'discard',
+                               side_effect=OSError('Сбой')):
+            with self.assertRaises(OSError):
+                flush_comments()
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(
+            len(self.client.get(self.detail).context['comments']), 3
+        )
+        flush_comments()
+        self.assertEqual(Comment.objects.count(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+
+    @print_func_info
+    def test_recreated_journal_starts_from_zero(self):
+        """Новый файл журнала не сверяется с отметкой прежнего."""
+        for number in range(3):
+            self.comment(f'Старый {number}')
+        flush_comments()
+        os.remove(settings.COMMENT_JOURNAL_PATH)
+        writebehind._journals.clear()
+        self.comment('Новый')
+        self.assertEqual(flush_comments(), 1)
+        self.assertEqual(Comment.objects.count(), 4)
+        self.assertEqual(
+            ImportCheckpoint.objects.get().source, get_journal().source
+        )
+
+    @print_func_info
+    def test_comments_to_deleted_post_are_dropped(self):
+        """Комментарии к удаленному посту не переносятся."""
+        doomed = Post.objects.create(author=self.reader, text='Удалят')
+        self.comment('Потеряется', post=doomed)
+        self.comment('Останется')
+        doomed.delete()
+        self.assertEqual(flush_comments(), 1)
+        self.assertEqual(Comment.objects.get().text, 'Останется')
+
+    @print_func_info
+    def test_flushed_comment_keeps_journal_time(self):
+        """Перенесенный комментарий хранит время попадания в журнал."""
+        written = timezone.now() - timedelta(hours=3)
+        with mock.patch.object(writebehind.timezone, 'now',
+                               return_value=written):
+            self.comment('Из очереди')
+        flush_comments()
+        self.assertEqual(Comment.objects.get().created, written)
+
+    @print_func_info
+    def test_flusher_starts_with_web_server(self):
+        """Перенос журнала запускает веб-сервер, а не каждый процесс."""
+        with mock.patch.object(writebehind, 'start_flusher') as start:
+            apps.get_app_config('posts').ready()
+            start.assert_not_called()
+            sys.modules.pop('yatube.wsgi', None)
+            import_module('yatube.wsgi')
+        start.assert_called_once_with()
@@ -0,0 +1,151 @@
+"""Фоновая нарезка миниатюр картинок постов.
+
+DeferredThumbnailBackend подключается через THUMBNAIL_BACKEND. Если
+миниатюры еще нет в хранилище sorl-thumbnail, тег {% thumbnail %}
+получает исходную картинку нужного размера, а сама миниатюра
+готовится в пуле потоков. Готовая миниатюра меняет версию «feed»:
+закешированные страницы и ETag лент с исходной картинкой устаревают.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from core.cache import bump_version
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_VARIANTS = (
+    ('900x339', {'crop': 'top', 'upscale': True}),
+    ('900x450', {'padding': True}),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+_render_state = threading.local()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+class PendingThumbnail(DummyImageFile):
+    """Исходная картинка в размерах еще не готовой миниатюры."""
+
+    def __init__(self, source, geometry_string):
+        super().__init__(geometry_string)
+        self.source = source
+
+    @property
+    def url(self):
+        return self.source.url
+
+
+@contextmanager
+def track_pending():
+    """Собирает миниатюры, которые не были готовы во время рендера."""
+    previous = getattr(_render_state, 'pending', None)
+    _render_state.pending = pending = []
+    try:
+        yield pending
+    finally:
+        _render_state.pending = previous
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Возвращает готовую миниатюру или None, ничего не создавая."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not settings.THUMBNAIL_DEFERRED or not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        cached = self.get_cached_thumbnail(
+            file_, geometry_string, **options
+        )
+        if cached:
+            return cached
+        schedule_thumbnail(file_, geometry_string, options)
+        pending = getattr(_render_state, 'pending', None)
+        if pending is not None:
+            pending.append(geometry_string)
+        return PendingThumbnail(file_, geometry_string)
+
+
+def generate_thumbnail(file_, geometry_string, options):
+    """Создает миниатюру; True, если ее еще не было."""
+    backend = DeferredThumbnailBackend()
+    if backend.get_cached_thumbnail(file_, geometry_string, **options):
+        return False
+    try:
+        ThumbnailBackend.get_thumbnail(
+            backend, file_, geometry_string, **options
+        )
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', file_)
+        return False
+    return True
+
+
+def refresh_thumbnail(file_, geometry_string, options):
+    """Создает отложенную миниатюру и сбрасывает ленты с исходником."""
+    if generate_thumbnail(file_, geometry_string, options):
+        bump_version('feed')
+
+
+def schedule_thumbnail(file_, geometry_string, options):
+    """Ставит миниатюру в очередь, если она еще не в работе."""
+    key = (str(file_), geometry_string, tuple(sorted(options.items())))
+    with _executor_lock:
+        if key in _in_flight:
+            return
+        _in_flight.add(key)
+
+    def job():
+        try:
+            refresh_thumbnail(file_, geometry_string, options)
+        finally:
+            close_old_connections()
+            with _executor_lock:
+                _in_flight.discard(key)
+
+    get_executor().submit(job)
+
+
+def schedule_post_thumbnails(post):
+    """После коммита готовит все варианты миниатюр картинки поста."""
+    if not settings.THUMBNAIL_DEFERRED or not post.image:
+        return
+    image = post.image
+
+    def enqueue():
+        for geometry_string, options in THUMBNAIL_VARIANTS:
+            schedule_thumbnail(image, geometry_string, dict(options))
+
+    transaction.on_commit(enqueue)
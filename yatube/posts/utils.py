@@ -1,10 +1,300 @@
+import base64
+import binascii
+from contextlib import contextmanager
+from functools import partial
+from math import ceil
+
+from core.concurrency import gather
+from core.sqlite import write_transaction
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .models import Comment, Follow, Post
+
+
+def pack_cursor(*values):
+    """Упаковывает значения ключа сортировки в строку для URL."""
+    raw = '|'.join(str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def unpack_cursor(cursor):
+    """Возвращает список строк из курсора или None для битого курсора."""
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def row_key(row):
+    """Позиция (created, id) объекта модели или строки values()."""
+    if isinstance(row, dict):
+        return row['created'], row['id']
+    return row.created, row.id
+
+
+def encode_cursor(obj):
+    """Кодирует позицию объекта (created, id) в строку для URL."""
+    created, pk = row_key(obj)
+    return pack_cursor(created.isoformat(), pk)
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (created, id) или None для битого курсора."""
+    try:
+        created, pk = unpack_cursor(cursor)
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+def keyset_filter(position, reverse=False, keys=('created', 'id')):
+    """Условие «строго после позиции» для сортировки по убыванию keys."""
+    created, pk = position
+    lookup = 'gt' if reverse else 'lt'
+    return (
+        Q(**{f'{keys[0]}__{lookup}': created})
+        | Q(**{keys[0]: created, f'{keys[1]}__{lookup}': pk})
+    )
+
+
+def seek(queryset, limit, position=None, reverse=False, offset=0,
+         keys=('created', 'id')):
+    """Возвращает limit записей queryset после позиции курсора.
+
+    queryset должен быть отсортирован по убыванию keys; reverse идет
+    в обратную сторону (к началу ленты).
+    """
+    if reverse:
+        queryset = queryset.reverse()
+    if position is not None:
+        queryset = queryset.filter(keyset_filter(position, reverse, keys))
+    return list(queryset[offset:offset + limit])
+
+
+def seek_page(queryset, limit, cursor=None, reverse=False):
+    """Возвращает limit записей после курсора и курсор следующих.
+
+    Курсор следующих пустой, если записей больше нет.
+    """
+    rows = seek(queryset, limit + 1, decode_cursor(cursor), reverse)
+    if len(rows) <= limit:
+        return rows, ''
+    return rows[:limit], encode_cursor(rows[limit - 1])
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (created, id).
+
+    Переход по ссылкам «вперед/назад» выполняется по курсору, поэтому
+    стоимость страницы не зависит от ее номера. Общее количество
+    записей считается не дальше count_limit, одновременно с выборкой
+    первой страницы или страницы по курсору.
+    """
+    ordering = ('-created', '-id')
+
+    def __init__(self, object_list, per_page, count_limit=None, **kwargs):
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+        self.count_limit = count_limit
+        self._seek = None
+
+    def _fetch(self, limit, position=None, reverse=False, offset=0):
+        return seek(self.object_list, limit, position, reverse, offset)
+
+    def _count(self, limit=None):
+        if limit is None:
+            return self.object_list.count()
+        return self.object_list[:limit].count()
+
+    def _fetch_counted(self, limit, position=None, reverse=False):
+        """_fetch параллельно с подсчетом записей для num_pages."""
+        if 'count' in self.__dict__:
+            return self._fetch(limit, position, reverse)
+        rows, self.count = gather(
+            partial(self._fetch, limit, position, reverse),
+            partial(self._count, self.count_limit)
+        )
+        return rows
+
+    def encode_cursor(self, obj):
+        return encode_cursor(obj)
+
+    def decode_cursor(self, cursor):
+        return decode_cursor(cursor)
+
+    @cached_property
+    def count(self):
+        return self._count(self.count_limit)
+
+    @property
+    def count_is_exact(self):
+        return self.count_limit is None or self.count < self.count_limit
+
+    @property
+    def num_pages(self):
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        num_pages = ceil(max(1, self.count - self.orphans) / self.per_page)
+        if self._seek is not None:
+            number, has_more = self._seek
+            return max(num_pages, number + 1) if has_more else number
+        if not self.count_is_exact:
+            num_pages += 1
+        return num_pages
+
+    def page(self, number):
+        first = str(number) == '1'
+        if first:
+            rows = self._fetch_counted(self.per_page + 1)
+        number = self.validate_number(number)
+        if not first:
+            bottom = (number - 1) * self.per_page
+            rows = self._fetch(self.per_page + 1, offset=bottom)
+        self._seek = (number, len(rows) > self.per_page)
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def cursor_page(self, cursor=None):
+        """Записи после курсора и курсор следующих, без подсчета записей.
+
+        Курсор следующих пустой, если записей больше нет.
+        """
+        rows = self._fetch(self.per_page + 1, self.decode_cursor(cursor))
+        if len(rows) <= self.per_page:
+            return rows, ''
+        rows = rows[:self.per_page]
+        return rows, self.encode_cursor(rows[-1])
+
+    def get_page(self, number, after=None, before=None):
+        position = self.decode_cursor(after or before)
+        if position is None:
+            return super().get_page(number)
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        if after:
+            rows = self._fetch_counted(self.per_page + 1, position)
+            if not rows:
+                return super().get_page(number)
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        else:
+            rows = self._fetch_counted(
+                self.per_page + 1, position, reverse=True
+            )
+            if len(rows) <= self.per_page:
+                return super().get_page(1)
+            number = max(number, 2)
+            has_more = True
+            rows = rows[:self.per_page][::-1]
+        self._seek = (number, has_more)
+        return self._get_page(rows, number, self)
+
+    def _get_page(self, object_list, number, paginator):
+        object_list = list(object_list)
+        page = super()._get_page(object_list, number, paginator)
+        page.next_cursor = page.previous_cursor = ''
+        if object_list:
+            page.previous_cursor = self.encode_cursor(object_list[0])
+            page.next_cursor = self.encode_cursor(object_list[-1])
+        return page
+
+
+def actual_comment_count():
+    """Число комментариев поста по таблице Comment для update()."""
+    comments = (
+        Comment.objects
+        .filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(comments), 0)
+
+
+def shift_comment_count(post_id, delta):
+    """Атомарно меняет счетчик комментариев поста на delta.
+
+    Вызывается из сигналов Comment, а при bulk_create — явно.
+    """
+    Post.objects.filter(id=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0),
+        updated=timezone.now()
+    )
+
+
+@write_transaction
+def save_post(post):
+    """Сохраняет пост вместе с раскладкой по лентам и счетчиками."""
+    post.save()
+
+
+@write_transaction
+def save_comment(comment):
+    """Сохраняет новый комментарий вместе со счетчиком поста."""
+    comment.save()
+
+
+@write_transaction
+def delete_comment(comment):
+    """Удаляет комментарий вместе со счетчиком поста."""
+    Comment.objects.filter(id=comment.id).delete()
+
+
+@write_transaction
+def follow_author(user, author):
+    """Подписывает user на author; True, если подписки еще не было."""
+    _, created = Follow.objects.get_or_create(user=user, author=author)
+    return created
+
+
+@write_transaction
+def unfollow_author(user, author):
+    Follow.objects.filter(user=user, author=author).delete()
+
+
+def paginate_page(request, post_list, post_per_page=10,
+                  paginator_class=KeysetPaginator, **kwargs):
+    paginator = paginator_class(
+        post_list,
+        post_per_page,
+        count_limit=settings.PAGINATOR_COUNT_LIMIT,
+        **kwargs
+    )
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
 
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет колбэки on_commit, отложенные в блоке.
 
-def paginate_page(request, post_list, post_per_page=10):
-    paginator = Paginator(post_list, post_per_page)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    TestCase не коммитит транзакцию, и без этого колбэки не запустятся.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
 
 
 def print_func_info(func):
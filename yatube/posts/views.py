@@ -1,34 +1,52 @@
+from core.cache import conditional_page, versioned_cache_page
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import (Http404, HttpResponseBadRequest,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from .export import EXPORT_FORMATS, export_lines
+from .feeds import FollowFeedPaginator
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import paginate_page
-
-
-@cache_page(20, key_prefix='index_page')
+from .groups import attach_groups, get_group_or_404, group_directory
+from .models import Comment, Post, User
+from .permissions import (can_delete_comment, can_edit_post,
+                          can_export_profile)
+from .search import SearchPaginator
+from .stamps import feed_stamp, post_stamp, profile_rows, profile_stamp
+from .thumbnails import schedule_post_thumbnails
+from .utils import (delete_comment, follow_author, paginate_page,
+                    save_comment, save_post, seek_page, unfollow_author)
+from .writebehind import enqueue_comment, pending_comments
+
+
+@conditional_page(feed_stamp)
+@versioned_cache_page(
+    settings.FEED_CACHE_TIMEOUT, key_prefix='index_page', version='feed'
+)
 def index(request):
     page_obj = paginate_page(
         request,
         Post.objects
-        .select_related('group', 'author',)
-        .prefetch_related('comments')
+        .select_related('author')
     )
+    attach_groups(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(feed_stamp)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = get_group_or_404(slug)
     page_obj = paginate_page(
         request,
         group.posts
-        .select_related('group', 'author')
-        .prefetch_related('comments')
+        .select_related('author')
     )
+    attach_groups(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -36,39 +54,106 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+def group_index(request):
+    context = {'groups': group_directory()}
+    return render(request, 'posts/groups.html', context)
+
+
+@conditional_page(profile_stamp)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group').prefetch_related('comments')
-    page_obj = paginate_page(request, posts)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            author_id=author.id,
-            user_id=request.user.id
-        ).exists()
-    else:
-        following = None
+    author, stats, following = profile_rows(request, username)
+    if author is None:
+        raise Http404
+    page_obj = paginate_page(request, author.posts.all())
+    attach_groups(page_obj)
     context = {
         'page_obj': page_obj,
         'author': author,
+        'stats': stats,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
-def post_detail(request, post_id):
-    form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.filter(post=post)
-    posts = post.author.posts.all()
+def search(request):
+    query = request.GET.get('q', '').strip()[:settings.SEARCH_QUERY_MAX_LENGTH]
+    page_obj = paginate_page(
+        request,
+        Post.objects.select_related('author'),
+        paginator_class=SearchPaginator,
+        query=query
+    )
+    attach_groups(page_obj)
     context = {
-        'posts': posts,
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comments_context(request, post):
+    """Контекст страницы комментариев поста по ?order= и ?after=."""
+    order = 'oldest' if request.GET.get('order') == 'oldest' else 'newest'
+    comments, next_cursor = seek_page(
+        Comment.objects
+        .filter(post_id=post.id)
+        .select_related('author')
+        .order_by('-created', '-id'),
+        settings.COMMENTS_PAGE_SIZE,
+        request.GET.get('after'),
+        reverse=order == 'oldest'
+    )
+    # Свои комментарии из журнала — самые новые в ветке.
+    if order == 'newest' and not request.GET.get('after'):
+        comments = pending_comments(post.id, request.user)[::-1] + comments
+    elif order == 'oldest' and not next_cursor:
+        comments = comments + pending_comments(post.id, request.user)
+    return {
         'post': post,
-        'form': form,
-        'comments': comments
+        'comments': comments,
+        'order': order,
+        'next_cursor': next_cursor,
+    }
+
+
+@conditional_page(post_stamp)
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author'), id=post_id
+    )
+    attach_groups([post])
+    context = {
+        'form': CommentForm(),
+        **comments_context(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return render(
+        request, 'includes/comments.html', comments_context(request, post)
+    )
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if not can_export_profile(request.user, author):
+        raise PermissionDenied
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    response = StreamingHttpResponse(
+        export_lines(author, export_format, request.GET.get('after')),
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{export_format}"'
+    )
+    return response
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -78,7 +163,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        save_post(post)
+        schedule_post_thumbnails(post)
         return redirect('posts:profile', post.author)
     context = {
         'form': form,
@@ -90,7 +176,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if not can_edit_post(request.user, post):
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -99,7 +185,9 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         post = form.save(commit=False)
-        post.save()
+        save_post(post)
+        if 'image' in form.changed_data:
+            schedule_post_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -110,25 +198,28 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        if settings.COMMENT_WRITE_BEHIND:
+            enqueue_comment(comment)
+        else:
+            save_comment(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = (
-        Post.objects
-        .select_related('author', 'group')
-        .filter(author__following__user=request.user)
-        .prefetch_related('comments')
+    page_obj = paginate_page(
+        request,
+        Post.objects.select_related('author'),
+        paginator_class=FollowFeedPaginator,
+        user=request.user
     )
-    page_obj = paginate_page(request, posts)
+    attach_groups(page_obj)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -137,20 +228,20 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        follow_author(request.user, author)
     return redirect('posts:follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    unfollow_author(request.user, author)
     return redirect('posts:follow_index')
 
 
 @login_required
 def comment_delete(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)
-    if request.user == comment.author:
-        Comment.objects.filter(id=comment.id).delete()
-    return redirect('posts:post_detail', post_id=comment.post.id)
+    if can_delete_comment(request.user, comment):
+        delete_comment(comment)
+    return redirect('posts:post_detail', post_id=comment.post_id)
@@ -0,0 +1,295 @@
+"""Отложенная запись комментариев под пиковой нагрузкой.
+
+При COMMENT_WRITE_BEHIND add_comment проверяет форму и пост, а сам
+комментарий дописывает в журнал — отдельный SQLite-файл
+COMMENT_JOURNAL_PATH. Строка журнала фиксируется на диске до ответа,
+поэтому принятый комментарий переживает перезапуск процесса.
+
+flush_comments() переносит журнал в базу пачками по
+COMMENT_FLUSH_BATCH: одна транзакция, bulk_create и по одному
+обновлению счетчиков на пост и на автора. Номер последней перенесенной
+строки хранится в ImportCheckpoint в той же транзакции, поэтому строка
+не попадет в базу дважды, даже если процесс упал до очистки журнала.
+Отметка привязана к поколению журнала: у заново созданного файла
+отметка своя и начинается с нуля.
+Комментарий сохраняется со временем, когда он попал в журнал.
+Фоновый поток веб-сервера переносит журнал каждые COMMENT_FLUSH_INTERVAL
+секунд, начиная со старта yatube.wsgi, команда flush_comments — по
+требованию.
+
+Пока комментарий в журнале, его автор видит его в ветке с пометкой
+«публикуется»: pending_comments() читает журнал по посту и автору.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from core.cache import bump_version_on_commit
+from core.sqlite import write_transaction
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, ImportCheckpoint, Post
+from .search import fill_index, get_backend
+from .stats import shift_profile_stats
+from .utils import shift_comment_count
+
+logger = logging.getLogger('yatube.comments')
+
+JOURNAL_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS pending ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'post_id INTEGER NOT NULL, author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, created TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS pending_post_author '
+    'ON pending (post_id, author_id)',
+    'CREATE TABLE IF NOT EXISTS generation (id TEXT NOT NULL)',
+)
+
+# Пары id и created в одном UPDATE: 3 параметра на комментарий.
+CREATED_CHUNK = 300
+
+_journals = {}
+_journals_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+class CommentJournal:
+    """Очередь комментариев в отдельном SQLite-файле."""
+
+    def __init__(self, path):
+        self.path = path
+        with self.connect() as journal:
+            journal.execute('PRAGMA journal_mode=WAL')
+            for sql in JOURNAL_SCHEMA:
+                journal.execute(sql)
+            journal.execute(
+                'INSERT INTO generation (id) SELECT ? '
+                'WHERE NOT EXISTS (SELECT 1 FROM generation)',
+                (uuid.uuid4().hex,)
+            )
+            (generation,), = journal.execute(
+                'SELECT id FROM generation'
+            ).fetchall()
+        self.prefix = f'comments:{os.path.abspath(path)}:'
+        self.source = self.prefix + generation
+
+    @contextmanager
+    def connect(self):
+        journal = sqlite3.connect(self.path, timeout=20)
+        try:
+            with journal:
+                yield journal
+        finally:
+            journal.close()
+
+    def append(self, post_id, author_id, text, created):
+        with self.connect() as journal:
+            journal.execute(
+                'INSERT INTO pending (post_id, author_id, text, created) '
+                'VALUES (?, ?, ?, ?)',
+                (post_id, author_id, text, created.isoformat())
+            )
+
+    def rows(self, after, limit):
+        """Строки (id, post_id, author_id, text, created) после after."""
+        with self.connect() as journal:
+            return journal.execute(
+                'SELECT id, post_id, author_id, text, created FROM pending '
+                'WHERE id > ? ORDER BY id LIMIT ?',
+                (after, limit)
+            ).fetchall()
+
+    def rows_for(self, post_id, author_id):
+        with self.connect() as journal:
+            return journal.execute(
+                'SELECT id, text, created FROM pending '
+                'WHERE post_id = ? AND author_id = ? ORDER BY id',
+                (post_id, author_id)
+            ).fetchall()
+
+    def discard(self, last_id):
+        """Удаляет строки, уже перенесенные в базу."""
+        with self.connect() as journal:
+            journal.execute('DELETE FROM pending WHERE id <= ?', (last_id,))
+
+
+def get_journal():
+    path = settings.COMMENT_JOURNAL_PATH
+    with _journals_lock:
+        if path not in _journals:
+            _journals[path] = CommentJournal(path)
+        return _journals[path]
+
+
+def flushed_until(journal):
+    return (
+        ImportCheckpoint.objects
+        .filter(source=journal.source)
+        .values_list('lines', flat=True)
+        .first()
+    ) or 0
+
+
+def enqueue_comment(comment):
+    """Ставит проверенный, но не сохраненный комментарий в журнал."""
+    get_journal().append(
+        comment.post_id, comment.author_id, comment.text, timezone.now()
+    )
+    start_flusher()
+
+
+def pending_comments(post_id, user):
+    """Комментарии user к посту, которые еще ждут в журнале."""
+    if not settings.COMMENT_WRITE_BEHIND or not user.is_authenticated:
+        return []
+    journal = get_journal()
+    rows = journal.rows_for(post_id, user.id)
+    if not rows:
+        return []
+    # Строки между коммитом пачки и очисткой журнала уже в базе.
+    last_id = flushed_until(journal)
+    comments = []
+    for row_id, text, created in rows:
+        if row_id <= last_id:
+            continue
+        comment = Comment(
+            post_id=post_id, author=user, text=text,
+            created=parse_datetime(created)
+        )
+        comment.pending = True
+        comments.append(comment)
+    return comments
+
+
+def restore_created(created, ids):
+    """Возвращает комментариям ids время из журнала created.
+
+    auto_now_add перезаписывает created при bulk_create, а отключать его
+    на время переноса нельзя: параллельно пишут и обычные комментарии.
+    """
+    for start in range(0, len(ids), CREATED_CHUNK):
+        chunk = list(zip(
+            ids[start:start + CREATED_CHUNK],
+            created[start:start + CREATED_CHUNK]
+        ))
+        Comment.objects.filter(id__in=[id_ for id_, _ in chunk]).update(
+            created=Case(
+                *(When(id=id_, then=Value(value)) for id_, value in chunk),
+                output_field=DateTimeField()
+            )
+        )
+
+
+def insert_comments(comments):
+    """Сохраняет comments через bulk_create; возвращает их id по порядку."""
+    if connection.features.can_return_ids_from_bulk_insert:
+        Comment.objects.bulk_create(comments)
+        return [comment.pk for comment in comments]
+    # SQLite не возвращает id, но транзакция уже пишет и других
+    # писателей нет: новые комментарии — все после текущего максимума.
+    last_comment = (
+        Comment.objects.order_by('-id').values_list('id', flat=True).first()
+    ) or 0
+    Comment.objects.bulk_create(comments)
+    return list(
+        Comment.objects.filter(id__gt=last_comment)
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+@write_transaction
+def apply_batch(journal, batch_size):
+    """Переносит пачку журнала в базу.
+
+    Возвращает номер последней перенесенной строки и количество
+    сохраненных комментариев.
+    """
+    checkpoint, created = ImportCheckpoint.objects.get_or_create(
+        source=journal.source
+    )
+    if created:
+        # Отметки прежних поколений журнала больше не нужны.
+        ImportCheckpoint.objects.filter(
+            source__startswith=journal.prefix
+        ).exclude(id=checkpoint.id).delete()
+    rows = journal.rows(checkpoint.lines, batch_size)
+    if not rows:
+        return checkpoint.lines, 0
+    existing = set(
+        Post.objects
+        .filter(id__in={row[1] for row in rows})
+        .values_list('id', flat=True)
+    )
+    comments = [
+        Comment(
+            post_id=post_id, author_id=author_id, text=text,
+            created=parse_datetime(created)
+        )
+        for _, post_id, author_id, text, created in rows
+        if post_id in existing
+    ]
+    # Отметка идет первой записью транзакции: дальше SQLite не пустит
+    # других писателей до коммита.
+    checkpoint.lines = rows[-1][0]
+    checkpoint.save()
+    created = [comment.created for comment in comments]
+    ids = insert_comments(comments)
+    restore_created(created, ids)
+    for post_id, count in Counter(c.post_id for c in comments).items():
+        shift_comment_count(post_id, count)
+    for author_id, count in Counter(c.author_id for c in comments).items():
+        shift_profile_stats(author_id, comments_count=count)
+    with connection.cursor() as cursor:
+        fill_index(
+            get_backend(), cursor, Post.objects.none(),
+            Comment.objects.filter(id__in=ids)
+        )
+    if comments:
+        bump_version_on_commit('feed')
+    return checkpoint.lines, len(comments)
+
+
+def flush_comments(batch_size=None):
+    """Переносит весь журнал в базу; возвращает число комментариев."""
+    journal = get_journal()
+    batch_size = batch_size or settings.COMMENT_FLUSH_BATCH
+    total = 0
+    while journal.rows(0, 1):
+        last_id, saved = apply_batch(journal, batch_size)
+        journal.discard(last_id)
+        total += saved
+    return total
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.COMMENT_FLUSH_INTERVAL)
+        try:
+            flush_comments()
+        except Exception:
+            logger.exception('Не удалось перенести комментарии из журнала')
+        finally:
+            close_old_connections()
+
+
+def start_flusher():
+    """Запускает фоновый перенос журнала, если он еще не идет."""
+    global _flusher
+    if not settings.COMMENT_FLUSH_INTERVAL:
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(
+                target=_flush_forever, name='comment-flusher', daemon=True
+            )
+            _flusher.start()
@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -31,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,9 +70,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'MEMORY',
+}
+SQLITE_WRITE_QUEUE = True
+SQLITE_BUSY_RETRIES = 5
+SQLITE_BUSY_BACKOFF = 0.05
+
+# Локальные реплики: YATUBE_SQLITE_REPLICAS=2 добавляет файлы
+# db.replica1.sqlite3 и db.replica2.sqlite3, их обновляет sync_replicas.
+for number in range(1, int(os.environ.get('YATUBE_SQLITE_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.replica{number}.sqlite3'),
+        # Копия подменяет файл: долгое соединение читало бы старый.
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_MAX_LAG = 10
+REPLICA_CHECK_INTERVAL = 5
+# Здоровье кешируется: реплика может отставать на REPLICA_MAX_LAG
+# и еще REPLICA_CHECK_INTERVAL секунд после проверки.
+REPLICA_PIN_SECONDS = REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -86,11 +121,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Версии закешированных страниц и реестр групп живут в кеше. Если сайт
+# обслуживают несколько процессов, нужен общий кеш: YATUBE_MEMCACHED=
+# host:port включает memcached (пакет python-memcached). Локальный кеш
+# виден только своему процессу, поэтому версии в нем живут
+# CACHE_VERSION_TIMEOUT секунд: правку из другого процесса страницы
+# покажут не позже.
+MEMCACHED_LOCATION = os.environ.get('YATUBE_MEMCACHED')
+if MEMCACHED_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION,
+        }
     }
-}
+    CACHE_VERSION_TIMEOUT = None
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    CACHE_VERSION_TIMEOUT = 60
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
@@ -124,3 +176,68 @@ STATICFILES_DIRS = (
 )
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+PAGINATOR_COUNT_LIMIT = 1000
+
+COMMENTS_PAGE_SIZE = 20
+
+COMMENT_WRITE_BEHIND = False
+COMMENT_JOURNAL_PATH = os.path.join(BASE_DIR, 'comment_journal.sqlite3')
+COMMENT_FLUSH_INTERVAL = 0.2
+COMMENT_FLUSH_BATCH = 500
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+EXPORT_CHUNK_SIZE = 2000
+
+VIEW_QUERY_WORKERS = 8
+
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_LIMIT = 1000
+FEED_BATCH_SIZE = 1000
+
+FEED_CACHE_TIMEOUT = 3 * 60 * 60
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_WAIT = 2
+
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+POST_CARD_MEMO_SIZE = 1000
+
+GROUP_CACHE_TIMEOUT = 24 * 60 * 60
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_DEFERRED = not DEBUG
+THUMBNAIL_WORKERS = 2
+
+IMAGE_UPLOAD_MAX_BYTES = 20 * 2 ** 20
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIDE = 1800
+IMAGE_UPLOAD_FORMAT = 'JPEG'
+IMAGE_QUALITY = 85
+
+SEARCH_QUERY_MAX_LENGTH = 200
+
+METRICS_LOG_SAMPLE_RATE = 0.0
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'raw': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'raw',
+        },
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['metrics'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -1,7 +1,14 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.COMMENT_WRITE_BEHIND:
+    # Журнал, оставшийся с прошлого запуска, переносится сразу. Только
+    # здесь: migrate, shell и тесты поток не запускают.
+    from posts.writebehind import start_flusher
+    start_flusher()